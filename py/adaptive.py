@@ -0,0 +1,61 @@
+import math
+import numpy as np
+from crowd import Crowd
+
+class AdaptiveTimestep:
+    """Chooses each step's dt from the crowd's current state.
+
+    Every agent gets a safe local step: the smaller of a fraction of its
+    soonest time to collision and the time to travel a fraction of its
+    radius at its current speed. The global step is the smallest local
+    step clamped to [dt_min, dt_max], a CFL-like rule on min TTC. The floor
+    is below the scenarios' fixed step, so dense phases take smaller steps
+    and open ones larger.
+
+    With ``regions`` the frame step is dt_max. Agents then substep by the
+    tightest local step in their grid cell, at most ``max_substeps`` times,
+    so only dense regions pay for small steps.
+    """
+
+    def __init__(self, dt_min=0.01, dt_max=0.2, ttc_fraction=0.5, travel_fraction=0.5, regions=False,
+                 max_substeps=None):
+        # a --timestep cap below the floor makes the step fixed
+        self.dt_min = min(dt_min, dt_max)
+        self.dt_max = dt_max
+        self.ttc_fraction = ttc_fraction
+        self.travel_fraction = travel_fraction
+        self.regions = regions
+        # by default a region can always reach the floor
+        self.max_substeps = max_substeps or math.ceil(self.dt_max / self.dt_min - 1e-9)
+        self.crowd = None
+
+    def local_dt(self, agents):
+        if self.crowd is None or self.crowd.count != len(agents):
+            self.crowd = Crowd(len(agents))
+        crowd = self.crowd
+        crowd.load(agents)
+
+        speed = np.hypot(crowd.velocity[:, 0], crowd.velocity[:, 1])
+        with np.errstate(divide="ignore"):
+            travel = self.travel_fraction * crowd.radius / speed
+        # candidates come from Crowd's cell list, so this costs O(N) like the step itself
+        ttc = self.ttc_fraction * crowd.min_time_to_collision()
+        return np.clip(np.minimum(travel, ttc), self.dt_min, self.dt_max)
+
+    def choose(self, scenario):
+        """Returns (dt, substeps); substeps is None or one count per agent."""
+        agents = scenario.active
+        if not agents:
+            return self.dt_max, None
+        local = self.local_dt(agents)
+        if not self.regions:
+            return float(local.min()), None
+
+        dt = self.dt_max
+        cell = np.floor(self.crowd.position / scenario.grid.cell_size)
+        _, region = np.unique(cell, axis=0, return_inverse=True)
+        region = region.reshape(-1)
+        tightest = np.full(region.max() + 1, math.inf)
+        np.minimum.at(tightest, region, local)
+        substeps = np.ceil(dt / tightest[region] - 1e-9).astype(int)
+        return dt, np.clip(substeps, 1, self.max_substeps)
@@ -1,9 +1,8 @@
-import pygame
 from pygame.math import Vector2
 from agent import Agent
 from wall import Wall
-from physics import update_agent
-import utils
+from regions import Region
+from simulation import Scenario, main
 import random
 
 CONFIG = {
@@ -17,25 +16,8 @@ CONFIG = {
     "SIDESTEP": 5,
 }
 
-SCREEN_WIDTH = 600
-SCREEN_HEIGHT = 600
-TIMESTEP = 0.05
-
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-clock = pygame.time.Clock()
-
-agents = []
-walls = []
-leftRows = []
-rightRows = []
-orders = []
-aisle = []
-rowNum = 0
-positions = {}
-frame = 0
-
 EPSILON = 0.1
+EXIT_Y = 460
 
 def to_pygame(pos3):
     x, z = pos3[0], pos3[2]
@@ -50,99 +32,85 @@ wallsData = [
     (28, 4, True, Vector2(0, 60))
 ]
 
-for width, height, vertical, pos in wallsData:
-    walls.append(Wall(width * 3, vertical, to_pygame((pos.x, 0, pos.y))))
-
-floor_rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
-
 geometry_rows = list(range(-47, 37, 5))
 seat_cols = [12, 8, 4, -12, -8, -4]
 
-for i, z in enumerate(geometry_rows):
-    row = []
-    for j in seat_cols:
-        start_pos = to_pygame((j, 0, z))
-        maxSpeed = CONFIG["MAXSPEED"] + random.uniform(-2, 2)
-        k = CONFIG["K"] + random.uniform(-1.5, 1.5)
-        horizon = CONFIG["HORIZON"] + random.uniform(-5, 5)
-        agent = Agent(
-            i * len(seat_cols) + j,
-            start_pos,
-            CONFIG["RADIUS"],
-            maxSpeed,
-            CONFIG["MAXFORCE"],
-            horizon,
-            k,
-            CONFIG["AVOID"],
-            CONFIG["SIDESTEP"]
-        )
-        row.append(agent)
-        agents.append(agent)
-    leftRows.append(row[:3])
-    rightRows.append(row[3:])
-    orders.append([True, True, True, False, False, False])
-    random.shuffle(orders[-1])
-    aisle.append(None)
-
-rowNum = len(aisle) - 1
-
-def shuffle(rowNum, left):
-    row = leftRows[rowNum] if left else rightRows[rowNum]
-    for agent in row:
-        agent.target.x += -4 if left else 4
-    nextAgent = row.pop() if row else None
-    if nextAgent:
-        aisle[rowNum] = nextAgent
-
-for i in range(len(aisle)):
-    shuffle(i, orders[i].pop())
-
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-    if rowNum >= 0:
-        agentInAisle = aisle[rowNum]
-        if not agentInAisle and orders[rowNum]:
-            shuffle(rowNum, orders[rowNum].pop())
-        agentInAisle = aisle[rowNum]
-        if agentInAisle:
-            reachedAisle = abs(agentInAisle.position.x - 300) < 5
-            if not reachedAisle:
-                agentInAisle.target.x = 300
-            else:
-                agentInAisle.target.y = 460
-                agentInAisle.state = "EXITING"
-                aisle[rowNum] = None
-        elif not orders[rowNum]:
-            rowNum -= 1
-
-    for agent in agents:
-        if getattr(agent, "state", None) == "EXITING":
-            if agent.position.y >= 460:
-                agent.target.x = 800
-                agent.state = "EXITED"
-            elif agent.position.y < 455:
+class Airplane(Scenario):
+    """Airplane deboarding"""
+    CONFIG = CONFIG
+
+    def setup(self):
+        config = self.config
+        self.leftRows = []
+        self.rightRows = []
+        self.orders = []
+        self.aisle = []
+
+        for width, height, vertical, pos in wallsData:
+            self.walls.append(Wall(width * 3, vertical, to_pygame((pos.x, 0, pos.y))))
+        # passengers leave the simulation once they are through the exit
+        self.sinks.append(Region(top=EXIT_Y))
+
+        for i, z in enumerate(geometry_rows):
+            row = []
+            for col, j in enumerate(seat_cols):
+                start_pos = to_pygame((j, 0, z))
+                maxSpeed = config["MAXSPEED"] + random.uniform(-2, 2)
+                k = config["K"] + random.uniform(-1.5, 1.5)
+                horizon = config["HORIZON"] + random.uniform(-5, 5)
+                agent = Agent(
+                    i * len(seat_cols) + col,
+                    start_pos,
+                    config["RADIUS"],
+                    maxSpeed,
+                    config["MAXFORCE"],
+                    horizon,
+                    k,
+                    config["AVOID"],
+                    config["SIDESTEP"]
+                )
+                row.append(agent)
+                self.agents.append(agent)
+            self.leftRows.append(row[:3])
+            self.rightRows.append(row[3:])
+            self.orders.append([True, True, True, False, False, False])
+            random.shuffle(self.orders[-1])
+            self.aisle.append(None)
+
+        self.rowNum = len(self.aisle) - 1
+
+        for i in range(len(self.aisle)):
+            self.shuffle(i, self.orders[i].pop())
+
+    def shuffle(self, rowNum, left):
+        row = self.leftRows[rowNum] if left else self.rightRows[rowNum]
+        for agent in row:
+            agent.target.x += -4 if left else 4
+        nextAgent = row.pop() if row else None
+        if nextAgent:
+            self.aisle[rowNum] = nextAgent
+
+    def update(self, dt):
+        rowNum = self.rowNum
+        if rowNum >= 0:
+            agentInAisle = self.aisle[rowNum]
+            if not agentInAisle and self.orders[rowNum]:
+                self.shuffle(rowNum, self.orders[rowNum].pop())
+            agentInAisle = self.aisle[rowNum]
+            if agentInAisle:
+                reachedAisle = abs(agentInAisle.position.x - 300) < 5
+                if not reachedAisle:
+                    agentInAisle.target.x = 300
+                else:
+                    agentInAisle.target.y = EXIT_Y
+                    agentInAisle.state = "EXITING"
+                    self.aisle[rowNum] = None
+            elif not self.orders[rowNum]:
+                self.rowNum -= 1
+
+        for agent in self.active:
+            if getattr(agent, "state", None) == "EXITING" and agent.position.y < 455:
                 agent.position.x = max(min(agent.position.x, 315), 285)
 
-    for agent in agents:
-        update_agent(agent, agents, TIMESTEP)
-    for agent in agents:
-        for wall in walls:
-            wall.collision_resolve(agent)
-
-    frame += 1
-    positions[frame] = {agent.id: (agent.position.x, agent.position.y) for agent in agents}
-
-    screen.fill((30, 30, 30))
-    for wall in walls:
-        pygame.draw.rect(screen, (200, 200, 200), wall.rect)
-    for agent in agents:
-        pygame.draw.circle(screen, (0, 255, 0), (int(agent.position.x), int(agent.position.y)), int(agent.radius))
-
-    pygame.display.flip()
-    clock.tick(60)
-
-pygame.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main(Airplane)
@@ -0,0 +1,303 @@
+"""
+Scaling benchmarks for the physics engine and end-to-end scenario runs.
+
+    python bench.py --out bench.json
+    python bench.py --counts 100 1000 --layouts door --out new.json --baseline bench.json
+    python bench.py --counts --scenarios room walkway --ensemble-seeds 20
+
+Kernel benchmarks time one simulation step's worth of work at each agent
+count and layout. A measurement that would run past --budget seconds is
+stopped early and extrapolated from the agents it got through, and marked
+partial. With --baseline, every result matching a baseline entry is
+compared and the run exits with status 1 if any is more than --tolerance
+slower.
+
+Ensemble benchmarks run --ensemble-seeds seeds of each scenario in lockstep
+and then as separate runs of the same length, both with the per-step
+metrics sweep.py collects, and report the time per replica step of each.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import numpy as np
+from pygame.math import Vector2
+from agent import Agent
+from wall import Wall
+from grid import SpatialGrid
+from physics import time_to_collision, update_agent
+from walls import WallSet
+from crowd import CrowdStepper
+from kernels import AVAILABLE, CompiledStepper
+from simulation import SCENARIOS, load_scenario
+from ensemble import Ensemble
+from sweep import count_collisions
+
+COUNTS = [100, 1000, 10000, 50000]
+LAYOUTS = ["uniform", "door", "counterflow"]
+BENCHMARKS = ["update_agent", "time_to_collision", "collision_resolve", "wallset", "vector", "compiled"]
+TIMESTEP = 0.05
+# agent parameters, roughly those of the scenario scripts
+RADIUS = 3
+MAXSPEED = 15
+HORIZON = 5
+# every layout has the same mean density, one agent per SPACING x SPACING square
+SPACING = 30
+# agents sampled for the time_to_collision pass
+TTC_SAMPLE = 2000
+
+
+def make_agent(i, pos, target, rng):
+    agent = Agent(i, Vector2(pos), RADIUS, rng.uniform(0.5, 1) * MAXSPEED, 50, HORIZON, 3, 15, 15)
+    agent.target = Vector2(target)
+    return agent
+
+
+def make_scene(count, layout, seed=0):
+    """Agents and walls for one benchmark layout."""
+    rng = random.Random(seed)
+    side = SPACING * math.sqrt(count)
+    agents = []
+    walls = []
+
+    if layout == "uniform":
+        for i in range(count):
+            agent = make_agent(i, (rng.uniform(0, side), rng.uniform(0, side)),
+                               (rng.uniform(0, side), rng.uniform(0, side)), rng)
+            agent.velocity = Vector2(rng.uniform(-1, 1), rng.uniform(-1, 1)) * agent.max_speed / 2
+            agents.append(agent)
+    elif layout == "door":
+        # a dense half-disc queueing at a 20 px door in a wall along y = 0
+        spread = side / 4
+        for i in range(count):
+            pos = (rng.gauss(0, spread), -abs(rng.gauss(0, spread)) - RADIUS)
+            agents.append(make_agent(i, pos, (0, 50), rng))
+        walls.append(Wall(side, True, Vector2(-side / 2 - 10, 0)))
+        walls.append(Wall(side, True, Vector2(side / 2 + 10, 0)))
+    elif layout == "counterflow":
+        # two interleaved streams walking in opposite directions along a corridor
+        length, width = 2 * side, side / 2
+        for i in range(count):
+            pos = (rng.uniform(0, length), rng.uniform(0, width))
+            direction = 1 if i % 2 else -1
+            agent = make_agent(i, pos, (length / 2 + direction * length, pos[1]), rng)
+            agent.velocity = Vector2(direction * agent.max_speed, 0)
+            agents.append(agent)
+        walls.append(Wall(length, True, Vector2(length / 2, -4)))
+        walls.append(Wall(length, True, Vector2(length / 2, width + 4)))
+    else:
+        raise ValueError(f"unknown layout {layout!r}")
+
+    # pillars scattered over the occupied area, so wall work grows with the scene
+    lo = np.min([(a.position.x, a.position.y) for a in agents], axis=0)
+    hi = np.max([(a.position.x, a.position.y) for a in agents], axis=0)
+    for _ in range(max(4, count // 50)):
+        walls.append(Wall(20, rng.random() < 0.5, Vector2(rng.uniform(lo[0], hi[0]), rng.uniform(lo[1], hi[1]))))
+    return agents, walls
+
+
+def timed(work, size, budget, repeats=3):
+    """(seconds per pass of work(0) .. work(size - 1), partial).
+
+    Passes repeat up to ``repeats`` times within ``budget`` seconds and the
+    fastest counts. A first pass that outruns the budget is extrapolated
+    from the items it finished.
+    """
+    best = math.inf
+    deadline = time.perf_counter() + budget
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(size):
+            work(i)
+            if i % 64 == 63 and best == math.inf and time.perf_counter() > deadline:
+                return (time.perf_counter() - start) * size / (i + 1), True
+        best = min(best, time.perf_counter() - start)
+        if time.perf_counter() > deadline:
+            break
+    return best, False
+
+
+def bench_update_agent(agents, walls, budget):
+    grid = SpatialGrid()
+
+    def work(i):
+        if i == 0:
+            grid.rebuild(agents, TIMESTEP)
+        update_agent(agents[i], grid, TIMESTEP)
+    return timed(work, len(agents), budget)
+
+
+def bench_time_to_collision(agents, walls, budget):
+    # every candidate pair of a sample of agents, scaled up to the whole crowd
+    grid = SpatialGrid()
+    grid.rebuild(agents)
+    sample = random.Random(1).sample(agents, min(TTC_SAMPLE, len(agents)))
+    pairs = []
+    for agent in sample:
+        pairs.extend((agent, neighbor) for neighbor in grid.query(agent) if neighbor is not agent)
+        if len(pairs) > 5_000_000:
+            sample = sample[:sample.index(agent) + 1]
+            break
+
+    def work(i):
+        time_to_collision(*pairs[i])
+    seconds, partial = timed(work, len(pairs), budget)
+    return seconds * len(agents) / len(sample), partial
+
+
+def bench_collision_resolve(agents, walls, budget):
+    def work(i):
+        agent = agents[i]
+        for wall in walls:
+            wall.collision_resolve(agent)
+    return timed(work, len(agents), budget)
+
+
+def bench_wallset(agents, walls, budget):
+    wallset = WallSet(walls)
+    return timed(lambda i: wallset.resolve(agents), 1, budget)
+
+
+def bench_vector(agents, walls, budget):
+    stepper = CrowdStepper()
+    return timed(lambda i: stepper.step(agents, TIMESTEP), 1, budget)
+
+
+def bench_compiled(agents, walls, budget):
+    stepper = CompiledStepper()
+    stepper.step(agents, TIMESTEP)  # compile outside the timing
+    return timed(lambda i: stepper.step(agents, TIMESTEP), 1, budget)
+
+
+def bench_scenario(name, frames, budget):
+    scenario = load_scenario(name)(seed=0)
+    start = time.perf_counter()
+    while scenario.frame < frames and not scenario.done():
+        scenario.step(*scenario.next_step())
+        if time.perf_counter() - start > budget:
+            break
+    seconds = time.perf_counter() - start
+    return seconds / max(scenario.frame, 1), scenario.frame
+
+
+def bench_ensemble(name, seeds, frames, budget, physics="vector"):
+    """Seconds per replica step (lockstep, separate), over the frames the lockstep run got through."""
+    cls = load_scenario(name)
+    ensemble = Ensemble(cls, range(seeds), frames=frames, physics=physics)
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < budget:
+        stepped = ensemble.step()
+        if not stepped:
+            break
+        steps += stepped
+    lockstep = time.perf_counter() - start
+
+    separate = 0.0
+    for seed, replica in zip(range(seeds), ensemble.replicas):
+        scenario = cls(seed=seed, physics=physics)
+        start = time.perf_counter()
+        # the metrics of sweep.run_one, which the ensemble also collects
+        collisions = 0
+        speed = 0.0
+        while scenario.frame < replica.frame and not scenario.done():
+            scenario.step(scenario.timestep)
+            collisions += count_collisions(scenario)
+            speed += sum(agent.velocity.length() for agent in scenario.active)
+        separate += time.perf_counter() - start
+    return lockstep / max(steps, 1), separate / max(steps, 1)
+
+
+def result(name, seconds, **fields):
+    return dict(name=name, ms_per_step=seconds * 1000, steps_per_sec=1 / seconds if seconds else math.inf, **fields)
+
+
+def key(entry):
+    return (entry["name"], entry.get("count"), entry.get("layout"))
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against each matching baseline entry; returns the entries that regressed."""
+    old = {key(entry): entry for entry in baseline["results"]}
+    regressions = []
+    print(f"\n{'benchmark':<40} {'baseline ms':>12} {'now ms':>12} {'change':>8}")
+    for entry in results:
+        before = old.get(key(entry))
+        if before is None:
+            continue
+        change = entry["ms_per_step"] / before["ms_per_step"] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(entry)
+            flag = "  SLOWER"
+        label = " ".join(str(part) for part in key(entry) if part is not None)
+        print(f"{label:<40} {before['ms_per_step']:>12.3f} {entry['ms_per_step']:>12.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crowd engine scaling benchmarks")
+    parser.add_argument("--counts", type=int, nargs="*", default=COUNTS)
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=LAYOUTS)
+    parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--scenarios", nargs="*", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--frames", type=int, default=200, help="frames per scenario run")
+    parser.add_argument("--ensemble-seeds", type=int, default=20, help="replicas per ensemble benchmark; 0 skips them")
+    parser.add_argument("--budget", type=float, default=5.0, help="seconds allowed per measurement")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing, as a fraction")
+    args = parser.parse_args()
+
+    results = []
+    for count in args.counts:
+        for layout in args.layouts:
+            for name in args.benchmarks:
+                if name == "compiled" and not AVAILABLE:
+                    continue
+                # every benchmark gets a fresh scene, since stepping moves the agents
+                agents, walls = make_scene(count, layout)
+                seconds, partial = globals()[f"bench_{name}"](agents, walls, args.budget)
+                entry = result(name, seconds, count=count, layout=layout, partial=partial)
+                results.append(entry)
+                print(f"{name:<18} {count:>6} {layout:<12} {entry['ms_per_step']:>12.3f} ms/step"
+                      f"{'  (extrapolated)' if partial else ''}", flush=True)
+
+    for name in args.scenarios:
+        seconds, frames = bench_scenario(name, args.frames, args.budget * 10)
+        results.append(result(f"scenario:{name}", seconds, frames=frames))
+        print(f"{'scenario ' + name:<38} {seconds * 1000:>12.3f} ms/step over {frames} frames", flush=True)
+
+    if args.ensemble_seeds:
+        for name in args.scenarios:
+            lockstep, separate = bench_ensemble(name, args.ensemble_seeds, args.frames, args.budget * 10)
+            results.append(result(f"ensemble:{name}", lockstep, count=args.ensemble_seeds))
+            results.append(result(f"separate:{name}", separate, count=args.ensemble_seeds))
+            print(f"{'ensemble ' + name:<38} {lockstep * 1000:>12.3f} ms/replica step, separate "
+                  f"{separate * 1000:.3f}, {separate / lockstep:.2f}x", flush=True)
+
+    report = {
+        "meta": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                 "processor": platform.processor(), "cpus": os.cpu_count(), "numba": AVAILABLE,
+                 "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "budget": args.budget},
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) more than {args.tolerance:.0%} slower than {args.baseline}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import math
+import threading
+import numpy as np
+
+EPSILON = 1e-6
+# rows per chunk of the force pass; pairs come from a cell list, so this only bounds temporaries
+CHUNK = 2048
+MAX_CELLS = 512
+# cells per reach: neighbors come from (2 * SPAN + 1)^2 cells, a closer fit to the reach circle than 3 x 3
+SPAN = 2
+
+PARAMS = ("radius", "max_speed", "max_force", "horizon", "k", "avoid", "sidestep")
+
+
+def cell_index(position, size, group=None):
+    """Cell list over ``position`` with square cells of at least ``size``.
+
+    Returns ``(cell, shape, order, start, origin, size)``: agents in flat
+    cell c are order[start[c]:start[c + 1]], and cell (x, y) covers
+    origin + [x, x + 1) * size by origin + [y, y + 1) * size. With a
+    ``group`` per agent each group gets its own copy of the grid, cell
+    (g * shape[0] + x) * shape[1] + y, so neighbor lookups never cross
+    groups. Both Crowd and the kernels build their grids here.
+    """
+    groups = int(group.max()) + 1 if group is not None and len(group) else 1
+    origin = position.min(axis=0) if len(position) else np.zeros(2)
+    extent = float((position.max(axis=0) - origin).max()) if len(position) else 0.0
+    # widen the cells for very spread-out crowds so the grid, with every group's copy, stays small
+    size = max(size, extent * math.sqrt(groups) / MAX_CELLS, EPSILON)
+    cell = ((position - origin) // size).astype(np.int64)
+    shape = cell.max(axis=0) + 1 if len(position) else np.ones(2, dtype=np.int64)
+    key = cell[:, 0] * shape[1] + cell[:, 1]
+    if groups > 1:
+        key += group * (shape[0] * shape[1])
+    order = np.argsort(key, kind="stable")
+    start = np.concatenate(([0], np.cumsum(np.bincount(key, minlength=groups * shape[0] * shape[1]))))
+    return cell, shape, order, start, origin, size
+
+
+def cell_pairs(index, rows, group=None, span=1, half=False):
+    """(i, k) for every agent in the cells within ``span`` of each of ``rows``.
+
+    ``i`` indexes into ``rows`` and ``k`` into ``order``, so the neighbor is
+    agent order[k]. With ``half`` only a row's own cell and the cells after
+    it in key order are searched, so two cells meet from one side only.
+    """
+    cell, shape, order, start = index[:4]
+    cx, cy = cell[rows, 0], cell[rows, 1]
+    base = 0 if group is None else group[rows] * shape[0]
+    offsets = [(dx, dy) for dx in range(-span, span + 1) for dy in range(-span, span + 1)
+               if not half or (dx, dy) >= (0, 0)]
+    firsts = []
+    counts = []
+    for dx, dy in offsets:
+        x, y = cx + dx, cy + dy
+        inside = (x >= 0) & (x < shape[0]) & (y >= 0) & (y < shape[1])
+        flat = np.where(inside, (base + x) * shape[1] + y, 0)
+        firsts.append(start[flat])
+        counts.append(np.where(inside, start[flat + 1] - start[flat], 0))
+    first = np.concatenate(firsts)
+    count = np.concatenate(counts)
+    i = np.repeat(np.tile(np.arange(len(rows)), len(offsets)), count)
+    offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    return i, np.repeat(first, count) + offset
+
+
+def overlaps(position, radius, group=None, groups=1):
+    """Number of overlapping pairs of circles in each of ``groups`` groups (all in one without ``group``)."""
+    if not len(position):
+        return np.zeros(groups, dtype=int)
+    index = cell_index(position, 2 * radius.max(), group)
+    order = index[2]
+    # rows in cell order, so row i is slot i and each pair is kept from its lower slot
+    i, k = cell_pairs(index, order, group, half=True)
+    keep = k > i
+    a, b = order[i[keep]], order[k[keep]]
+    d = position[b] - position[a]
+    reach = radius[a] + radius[b]
+    hit = d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1] < reach * reach
+    return np.bincount(np.zeros(hit.sum(), dtype=int) if group is None else group[a[hit]], minlength=groups)
+
+
+class Crowd:
+    """Structure-of-arrays crowd state stepped with batched TTC forces.
+
+    All agents read the same snapshot of positions and velocities, so one
+    step is a synchronous update rather than the in-order update of
+    physics.update_agent. Candidate pairs come from a cell list sized to
+    the same reach bound as SpatialGrid, so a step costs O(N) in pairs
+    rather than O(N^2).
+
+    Agents only interact within their ``group``, which lets independent
+    replicas share one crowd.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.ids = np.arange(count)
+        self.position = np.zeros((count, 2))
+        self.velocity = np.zeros((count, 2))
+        self.target = np.zeros((count, 2))
+        for name in PARAMS:
+            setattr(self, name, np.zeros(count))
+        self.group = np.zeros(count, dtype=int)
+        self.grouped = False
+        # cell list, per-agent reach and cell-sorted copies of the state for the current positions, from index()
+        self.cells = None
+        self.reach = None
+        self.rank = None
+        self.sorted = None
+        # [candidate pairs tested, time-to-collision pairs] per thread since the last load; as SpatialGrid.counts
+        self.counts = {}
+
+    @classmethod
+    def from_agents(cls, agents):
+        crowd = cls(len(agents))
+        crowd.load(agents)
+        return crowd
+
+    @property
+    def candidates(self):
+        return sum(count[0] for count in self.counts.values())
+
+    @property
+    def pairs(self):
+        return sum(count[1] for count in self.counts.values())
+
+    def load(self, agents, groups=None):
+        self.counts = {}
+        self.ids[:] = [agent.id for agent in agents]
+        self.position[:] = [(agent.position.x, agent.position.y) for agent in agents]
+        self.velocity[:] = [(agent.velocity.x, agent.velocity.y) for agent in agents]
+        self.target[:] = [(agent.target.x, agent.target.y) for agent in agents]
+        for name in PARAMS:
+            getattr(self, name)[:] = [getattr(agent, name) for agent in agents]
+        self.group[:] = 0 if groups is None else groups
+        self.grouped = groups is not None
+        self.cells = None
+
+    def store(self, agents):
+        for agent, pos, vel in zip(agents, self.position.tolist(), self.velocity.tolist()):
+            agent.position.update(pos)
+            agent.velocity.update(vel)
+
+    def index(self):
+        """Build the cell list and the cell-sorted copy of the state for the current positions and velocities."""
+        speed = np.hypot(self.velocity[:, 0], self.velocity[:, 1])
+        if self.count:
+            # beyond this distance time_to_collision cannot fall inside the horizon, as in SpatialGrid.reach
+            fastest = max(speed.max(), self.max_speed.max())
+            self.reach = self.horizon * (np.maximum(speed, self.max_speed) + fastest) + self.radius + self.radius.max()
+            self.cells = cell_index(self.position, self.reach.max() / SPAN, self.group if self.grouped else None)
+        else:
+            self.reach = speed
+            self.cells = cell_index(self.position, 1.0)
+        # pairs are gathered by slot, the agent's place in cell order, so neighbors sit close together in memory
+        order = self.cells[2]
+        self.rank = np.empty_like(order)
+        self.rank[order] = np.arange(self.count)
+        self.sorted = {name: getattr(self, name)[order] for name in PARAMS + ("reach",)}
+        for axis, name in enumerate("xy"):
+            self.sorted[name] = self.position[order, axis]
+            self.sorted["v" + name] = self.velocity[order, axis]
+
+    def chunks(self):
+        return [np.arange(start, min(start + CHUNK, self.count)) for start in range(0, self.count, CHUNK)]
+
+    def collisions(self, slots):
+        """Candidate pairs from agents at ``slots`` and their time to collision.
+
+        Returns ``agent, k, t, wx, wy, dist2`` with both agents as slots of
+        the last ``index()`` and ``w`` the offset from ``agent`` to ``k``.
+        Time to collision is symmetric, so each pair comes once, with
+        ``agent < k``.
+        """
+        if self.cells is None:
+            self.index()
+        s = self.sorted
+        order = self.cells[2]
+
+        i, k = cell_pairs(self.cells, order[slots], self.group if self.grouped else None, SPAN, half=True)
+        count = self.counts.setdefault(threading.get_ident(), [0, 0])
+        count[0] += len(i)
+        agent = slots[i]
+        wx = s["x"][k] - s["x"][agent]
+        wy = s["y"][k] - s["y"][agent]
+        dist2 = wx * wx + wy * wy
+        keep = (dist2 <= np.maximum(s["reach"][agent], s["reach"][k]) ** 2) & (k > agent)
+        agent, k = agent[keep], k[keep]
+        wx, wy, dist2 = wx[keep], wy[keep], dist2[keep]
+        count[1] += len(agent)
+
+        r = s["radius"][agent] + s["radius"][k]
+        c = dist2 - r * r
+        rvx = s["vx"][agent] - s["vx"][k]
+        rvy = s["vy"][agent] - s["vy"][k]
+        a = rvx * rvx + rvy * rvy
+        b = wx * rvx + wy * rvy
+        discriminant = b * b - a * c
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tau = (b - np.sqrt(np.maximum(discriminant, 0))) / a
+        hit = (discriminant > 0) & (a != 0) & (tau >= 0)
+        t = np.where(c < 0, 0, np.where(hit, tau, np.inf))
+        return agent, k, t, wx, wy, dist2
+
+    def min_time_to_collision(self):
+        """Soonest positive time to collision per agent within its reach (inf if none)."""
+        soonest = np.full(self.count, np.inf)
+        self.index()
+        reach = self.sorted["reach"]
+        for slots in self.chunks():
+            agent, k, t, _, _, dist2 = self.collisions(slots)
+            for near in (agent, k):
+                ahead = (t > 0) & (dist2 <= reach[near] ** 2)
+                np.minimum.at(soonest, near[ahead], t[ahead])
+        return soonest[self.rank]
+
+    def avoidance(self, slots):
+        """Avoid and sidestep forces, by slot, from the pairs of agents at ``slots``; both agents of a pair get theirs."""
+        s = self.sorted
+        agent, k, t, wx, wy, dist2 = self.collisions(slots)
+
+        active = t <= np.maximum(s["horizon"][agent], s["horizon"][k])
+        agent, k, t = agent[active], k[active], t[active]
+        wx, wy, dist2 = wx[active], wy[active], dist2[active]
+        horizon = s["horizon"][agent], s["horizon"][k]
+        weight = [np.where(t <= h, (h - t) / (t + EPSILON), 0) for h in horizon]
+
+        # (dx, dy) points from k to agent; k is pushed the opposite way
+        dist = np.sqrt(dist2)
+        still = dist == 0
+        dist[still] = 1
+        dx = np.where(still, 1, -wx / dist)
+        dy = np.where(still, 0, -wy / dist)
+
+        # left = (-dy, dx); right = -left; each agent sidesteps away from the other's velocity
+        flip = np.where(-dy * s["vx"][k] + dx * s["vy"][k] < 0, 1, -1)
+        avoid = s["avoid"][agent] * weight[0]
+        side = s["sidestep"][agent] * weight[0] * flip
+        fx = np.bincount(agent, avoid * dx - side * dy, self.count)
+        fy = np.bincount(agent, avoid * dy + side * dx, self.count)
+
+        flip = np.where(dy * s["vx"][agent] - dx * s["vy"][agent] < 0, 1, -1)
+        avoid = s["avoid"][k] * weight[1]
+        side = s["sidestep"][k] * weight[1] * flip
+        fx -= np.bincount(k, avoid * dx - side * dy, self.count)
+        fy -= np.bincount(k, avoid * dy + side * dx, self.count)
+        return np.stack((fx, fy), axis=1)
+
+    def forces(self, pool=None):
+        goal = self.target - self.position
+        force = self.k[:, None] * (goal - self.velocity)
+        self.index()
+        chunks = self.chunks()
+        # parts are summed in chunk order, so a thread pool gives the same result as a serial pass
+        parts = map(self.avoidance, chunks) if pool is None else pool.map(self.avoidance, chunks)
+        avoidance = np.zeros((self.count, 2))
+        for part in parts:
+            avoidance += part
+        return force + avoidance[self.rank]
+
+    def apply_forces(self, force, timestep):
+        magnitude = np.linalg.norm(force, axis=1)
+        over = magnitude > self.max_force
+        force[over] *= (self.max_force[over] / magnitude[over])[:, None]
+        self.velocity += force * timestep
+
+        speed = np.linalg.norm(self.velocity, axis=1)
+        over = speed > self.max_speed
+        self.velocity[over] *= (self.max_speed[over] / speed[over])[:, None]
+        self.position += self.velocity * timestep
+        self.cells = None
+
+    def step(self, timestep, pool=None):
+        self.apply_forces(self.forces(pool), timestep)
+
+
+class CrowdStepper:
+    """Drop-in replacement for the per-agent ``update_agent`` loop.
+
+    Scenario scripts keep their ``Agent`` objects and state machines; each
+    call copies the agents into a ``Crowd``, steps it, and writes positions
+    and velocities back in place.
+    """
+
+    def __init__(self):
+        self.crowd = None
+
+    def step(self, agents, timestep, pool=None):
+        if self.crowd is None or self.crowd.count != len(agents):
+            self.crowd = Crowd(len(agents))
+        self.crowd.load(agents)
+        self.crowd.step(timestep, pool)
+        self.crowd.store(agents)
@@ -0,0 +1,49 @@
+import argparse
+import pygame
+
+def parse_args(description=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--headless", action="store_true", help="step as fast as possible without a window")
+    parser.add_argument("--frames", type=int, default=None, help="stop after this many frames")
+    parser.add_argument("--out", default=None, help="record trajectories to this directory, or to a text file if it ends in .txt")
+    parser.add_argument("--velocities", action="store_true", help="also record velocities")
+    parser.add_argument("--timestep", type=float, default=None, help="seconds per step, the scenario's TIMESTEP by default")
+    parser.add_argument("--ccd", action="store_true", help="sweep agents against walls each step")
+    parser.add_argument("--adaptive", action="store_true", help="choose each step from min time to collision; --timestep caps it")
+    parser.add_argument("--regions", action="store_true", help="with --adaptive, substep only dense grid cells")
+    parser.add_argument("--physics", choices=["serial", "sync", "vector", "compiled", "domains"], default="serial",
+                        help="in-order update_agent, synchronous update_agent, the NumPy crowd engine, "
+                             "Numba kernels (falls back to sync without Numba), or tiles on worker processes")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="threads for the sync and vector force phase, or processes for domains")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="PATH",
+                        help="print per-phase timings; with a .csv or .json PATH also write the per-frame timeline")
+    parser.add_argument("--seed", type=int, default=None, help="seed the random generators; with --resume, fork the checkpoint")
+    parser.add_argument("--checkpoint", default=None, metavar="PATH", help="save the full state here when the run ends")
+    parser.add_argument("--checkpoint-every", type=int, default=None, metavar="N", help="with --checkpoint, also save every N frames")
+    parser.add_argument("--resume", default=None, metavar="PATH",
+                        help="continue from a checkpoint; engine and timestep options come from the checkpoint")
+    return parser.parse_args()
+
+class Display:
+    def __init__(self, width, height, headless=False, fps=60):
+        self.headless = headless
+        self.fps = fps
+        self.screen = None
+        self.clock = None
+        if not headless:
+            pygame.init()
+            self.screen = pygame.display.set_mode((width, height))
+            self.clock = pygame.time.Clock()
+
+    def events(self):
+        return [] if self.headless else pygame.event.get()
+
+    def flip(self):
+        if not self.headless:
+            pygame.display.flip()
+            self.clock.tick(self.fps)
+
+    def close(self):
+        if not self.headless:
+            pygame.quit()
@@ -0,0 +1,197 @@
+"""
+Spatial domain decomposition of a crowd across worker processes.
+
+Crowd state lives in multiprocessing.shared_memory, with positions and
+velocities double-buffered. Each step the plane is cut into tiles at
+position quantiles, one task per tile. A worker reads its tile's agents
+plus the halo of agents within its own agents' interaction reach, computes
+their TTC forces and writes its own agents' new positions and velocities
+into the other buffer. Tiles are recut every step, so agents that cross a
+border migrate to the neighboring tile on the next step without copying
+state between workers.
+
+Workers are started from a forkserver rather than forked, since forking a
+process whose numba prange threads are running hangs it at exit.
+
+Forces are the synchronous ones of Crowd and physics.update_agents_sync;
+tests/test_domains.py checks a decomposed step against both.
+"""
+
+import math
+import multiprocessing
+import os
+import weakref
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import kernels
+from crowd import PARAMS, Crowd
+
+SPARE = ("spare_position", "spare_velocity")
+
+
+def layout(tiles):
+    """(columns, rows) of a tile grid with ``tiles`` cells, as square as possible."""
+    columns = int(math.sqrt(tiles))
+    while tiles % columns:
+        columns -= 1
+    return columns, tiles // columns
+
+
+def partition(pos, tiles, speed, horizon, radius):
+    """(owned, halo) row indices for each tile of a quantile cut of ``pos``.
+
+    ``speed`` bounds each agent's speed over the step. A tile's halo is the
+    agents that could come within the horizon of one of its own, with the
+    SpatialGrid.reach bound taken from the tile's own agents and the
+    neighbor's speed, so one fast agent does not widen every tile's halo.
+    """
+    columns, rows = layout(tiles)
+    x_cuts = np.quantile(pos[:, 0], np.linspace(0, 1, columns + 1)[1:-1])
+    column = np.searchsorted(x_cuts, pos[:, 0], side="right")
+
+    parts = []
+    for c in range(columns):
+        members = np.nonzero(column == c)[0]
+        if not len(members):
+            continue
+        y_cuts = np.quantile(pos[members, 1], np.linspace(0, 1, rows + 1)[1:-1])
+        row = np.searchsorted(y_cuts, pos[members, 1], side="right")
+        for r in range(rows):
+            owned = members[row == r]
+            if not len(owned):
+                continue
+            reach = horizon[owned].max() * (speed[owned].max() + speed) + radius[owned].max() + radius
+            gap = np.maximum(pos[owned].min(axis=0) - pos, pos - pos[owned].max(axis=0))
+            near = np.all(gap <= reach[:, None], axis=1)
+            near[owned] = False
+            parts.append((owned, np.nonzero(near)[0]))
+    return parts
+
+
+_shared = {}
+
+
+def _attach(specs):
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _shared[name] = (shm, np.ndarray(shape, dtype, shm.buf))
+    if kernels.AVAILABLE:
+        # one process per tile already uses every core
+        kernels.set_num_threads(1)
+
+
+def _step_tile(owned, halo, read, timestep, cell_size):
+    arrays = {name: array for name, (_, array) in _shared.items()}
+    position, velocity = (arrays["position"], arrays["velocity"]) if read == 0 else (arrays[SPARE[0]], arrays[SPARE[1]])
+    rows = np.concatenate((owned, halo))
+    count = len(owned)
+
+    local = Crowd(len(rows))
+    local.ids[:] = arrays["ids"][rows]
+    local.position[:] = position[rows]
+    local.velocity[:] = velocity[rows]
+    local.target[:] = arrays["target"][rows]
+    for name in PARAMS:
+        getattr(local, name)[:] = arrays[name][rows]
+
+    # halo agents are only read, so they get no force and are not written back
+    force = np.zeros_like(local.position)
+    if kernels.AVAILABLE:
+        force[:count] = kernels.crowd_forces(local, cell_size)[:count]
+    else:
+        force[:count] = local.forces()[:count]
+    local.apply_forces(force, timestep)
+
+    position, velocity = (arrays[SPARE[0]], arrays[SPARE[1]]) if read == 0 else (arrays["position"], arrays["velocity"])
+    position[owned] = local.position[:count]
+    velocity[owned] = local.velocity[:count]
+
+
+def _release(blocks, pool):
+    pool.shutdown(cancel_futures=True)
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+class DomainCrowd(Crowd):
+    """A ``Crowd`` in shared memory, stepped tile by tile on a process pool."""
+
+    def __init__(self, count, tiles=None, workers=None, cell_size=30):
+        self.count = count
+        self.capacity = count
+        self.workers = workers or os.cpu_count()
+        self.tiles = tiles or self.workers
+        self.cell_size = cell_size
+        self.read = 0
+
+        fields = [("ids", (count,), np.int64), ("position", (count, 2), np.float64),
+                  ("velocity", (count, 2), np.float64), ("target", (count, 2), np.float64)]
+        fields += [(name, (count, 2), np.float64) for name in SPARE]
+        fields += [(name, (count,), np.float64) for name in PARAMS]
+        self.blocks = []
+        self.specs = {}
+        self.full = {}
+        for name, shape, dtype in fields:
+            shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+            self.blocks.append(shm)
+            self.specs[name] = (shm.name, shape, dtype)
+            self.full[name] = np.ndarray(shape, dtype, shm.buf)
+        self.resize(count)
+        self.ids[:] = np.arange(count)
+
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("forkserver"),
+                                        initializer=_attach, initargs=(self.specs,))
+        self._finalizer = weakref.finalize(self, _release, self.blocks, self.pool)
+
+    def resize(self, count):
+        """Use the first ``count`` rows; shrinking keeps the shared memory and the workers."""
+        if count > self.capacity:
+            raise ValueError(f"{count} agents do not fit a DomainCrowd of {self.capacity}")
+        self.count = count
+        for name, array in self.full.items():
+            setattr(self, name, array[:count])
+        # tiles are stepped as one group, but load() still fills these in
+        self.group = np.zeros(count, dtype=int)
+        self.grouped = False
+        self.cells = None
+        if self.read:
+            self.position, self.spare_position = self.spare_position, self.position
+            self.velocity, self.spare_velocity = self.spare_velocity, self.velocity
+
+    def step(self, timestep, pool=None):
+        if not self.count:
+            return
+        speed = np.maximum(np.hypot(self.velocity[:, 0], self.velocity[:, 1]), self.max_speed)
+        parts = partition(self.position, self.tiles, speed, self.horizon, self.radius)
+        futures = [self.pool.submit(_step_tile, owned, halo, self.read, timestep, self.cell_size)
+                   for owned, halo in parts]
+        for future in futures:
+            future.result()
+        # the workers wrote the other buffer; make it current
+        self.position, self.spare_position = self.spare_position, self.position
+        self.velocity, self.spare_velocity = self.spare_velocity, self.velocity
+        self.read = 1 - self.read
+
+    def close(self):
+        self._finalizer()
+
+
+class DomainStepper:
+    """CrowdStepper on a ``DomainCrowd``, for scenarios run with physics="domains"."""
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self.crowd = None
+
+    def step(self, agents, timestep):
+        if self.crowd is None or self.crowd.capacity < len(agents):
+            if self.crowd is not None:
+                self.crowd.close()
+            self.crowd = DomainCrowd(len(agents), workers=self.workers)
+        self.crowd.resize(len(agents))
+        self.crowd.load(agents)
+        self.crowd.step(timestep)
+        self.crowd.store(agents)
+
@@ -0,0 +1,230 @@
+"""
+Lockstep ensembles: many seeds of one scenario stepped as one batch.
+
+    python ensemble.py room --seeds 100 --frames 3000 --out room.csv
+    python ensemble.py walkway --seeds 20 --config RATE=2 --frames 1000
+
+Each replica keeps its own agents, rules and random state. Everything
+else runs once per frame for the whole ensemble on one Crowd that stacks
+the active agents of every running replica, grouped by replica:
+- the physics step;
+- wall collisions, for all replicas that share a wall layout;
+- the sink test;
+- the collision and speed metrics.
+Only the scenario rules and spawning stay per replica, along with
+Scenario.prestep; a replica whose prestep takes the frame, like subway's
+boarding animation, sits out that frame's batch. A replica that is done or
+reaches the frame limit drops out of the batch and costs nothing more.
+
+Each replica gets its own copy of the cell grid, so groups never see each
+other, but the shared grid bounds change the order forces are summed in and
+replicas agree with separate runs of the same seeds to rounding only, as
+tests/test_ensemble.py checks.
+"""
+
+import argparse
+import csv
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+from crowd import Crowd, overlaps
+from kernels import AVAILABLE, step_crowd
+from simulation import SCENARIOS, load_scenario
+from sweep import parse_value
+
+COLUMNS = ["seed", "frames", "evac_time", "collisions", "mean_speed"]
+
+
+class Ensemble:
+    def __init__(self, scenario_cls, seeds, config=None, timestep=None, ccd=False, frames=None, physics="vector",
+                 workers=None):
+        self.seeds = list(seeds)
+        self.frames = frames
+        self.replicas = []
+        # each replica's random state, swapped in around its rules and lifecycle; scenarios only use
+        # np.random during setup, and swapping its state too would cost more than a small replica's step
+        self.states = []
+        for seed in self.seeds:
+            self.replicas.append(scenario_cls(config, seed=seed, timestep=timestep, ccd=ccd))
+            self.states.append(random.getstate())
+        self.timestep = self.replicas[0].timestep if self.replicas else timestep
+        self.ccd = ccd
+        self.physics = physics
+        self.crowd = Crowd(0)
+        self.pool = ThreadPoolExecutor(workers) if workers and physics == "vector" else None
+        self.collisions = [0] * len(self.replicas)
+        self.speed = [0.0] * len(self.replicas)
+        self.samples = [0] * len(self.replicas)
+
+    @contextmanager
+    def seeded(self, r):
+        random.setstate(self.states[r])
+        try:
+            yield
+        finally:
+            self.states[r] = random.getstate()
+
+    def finished(self, r):
+        replica = self.replicas[r]
+        return replica.done() or self.frames is not None and replica.frame >= self.frames
+
+    def running(self):
+        return [r for r in range(len(self.replicas)) if not self.finished(r)]
+
+    def step(self):
+        """Advance every running replica by one timestep; returns how many were stepped."""
+        dt = self.timestep
+        running = self.running()
+        batch = []
+        for r in running:
+            replica = self.replicas[r]
+            with self.seeded(r):
+                if replica.prestep(dt):
+                    replica.update(dt)
+                    batch.append(r)
+
+        agents = []
+        sizes = []
+        for r in batch:
+            agents.extend(self.replicas[r].active)
+            sizes.append(len(self.replicas[r].active))
+        groups = np.repeat(np.arange(len(batch)), sizes)
+        if self.crowd.count != len(agents):
+            self.crowd = Crowd(len(agents))
+        crowd = self.crowd
+        if agents:
+            crowd.load(agents, groups)
+            prev = crowd.position.copy() if self.ccd else None
+            if self.physics == "compiled" and AVAILABLE:
+                step_crowd(crowd, dt)
+            else:
+                crowd.step(dt, self.pool)
+            self.collide(batch, groups, prev)
+            crowd.store(agents)
+
+        inside = self.inside(batch, groups)
+        bounds = np.cumsum([0] + sizes)
+        # measure() groups by position in running, and takes the agents it has no arrays for as objects
+        index = np.searchsorted(running, batch).astype(int)
+        extra = [(n, agent) for n, r in enumerate(running) if r not in batch for agent in self.replicas[r].active]
+        for n, r in enumerate(batch):
+            replica = self.replicas[r]
+            with self.seeded(r):
+                replica.finish(dt, inside[bounds[n]:bounds[n + 1]])
+            # finish() keeps the agents that stayed in order and appends the ones it spawned
+            extra.extend((index[n], agent)
+                         for agent in replica.active[sizes[n] - inside[bounds[n]:bounds[n + 1]].sum():])
+        self.measure(running, index[groups[~inside]], crowd.position[~inside], crowd.velocity[~inside],
+                     crowd.radius[~inside], extra)
+        return len(running)
+
+    def collide(self, batch, groups, prev=None):
+        """Walls for the stacked crowd, one batch per distinct wall layout; as Scenario.collide."""
+        crowd = self.crowd
+        layouts = {}
+        for n, r in enumerate(batch):
+            wallset = self.replicas[r].wallset
+            key = b"".join(edge.tobytes() for edge in (wallset.left, wallset.top, wallset.right, wallset.bottom))
+            layouts.setdefault(key, (wallset, []))[1].append(n)
+        for wallset, members in layouts.values():
+            rows = np.flatnonzero(np.isin(groups, members))
+            pos, vel, radius = crowd.position[rows], crowd.velocity[rows], crowd.radius[rows]
+            if prev is not None:
+                wallset.sweep_arrays(prev[rows], pos, vel, radius)
+            wallset.resolve_arrays(pos, radius)
+            crowd.position[rows] = pos
+            crowd.velocity[rows] = vel
+
+    def inside(self, batch, groups):
+        """Whether each stacked agent is in one of its replica's sinks."""
+        position = self.crowd.position
+        sinks = [self.replicas[r].sinks for r in batch]
+        count = max(map(len, sinks), default=0)
+        if not count:
+            return np.zeros(len(position), dtype=bool)
+        # left, top, right, bottom of every replica's sinks, padded with empty boxes
+        box = np.tile([np.inf, np.inf, -np.inf, -np.inf], (len(batch), count, 1))
+        for n, regions in enumerate(sinks):
+            for s, sink in enumerate(regions):
+                box[n, s] = (sink.left, sink.top, sink.right, sink.bottom)
+        box = box[groups]
+        x, y = position[:, 0:1], position[:, 1:2]
+        return ((box[..., 0] <= x) & (x <= box[..., 2]) & (box[..., 1] <= y) & (y <= box[..., 3])).any(axis=1)
+
+    def measure(self, running, groups, position, velocity, radius, extra):
+        """Add the sweep.run_one metrics of every replica's active agents after the step.
+
+        ``extra`` holds (group, agent) for agents that are not in the arrays: the ones spawned this
+        frame and those of replicas that sat out the batch.
+        """
+        if extra:
+            groups = np.concatenate((groups, [n for n, _ in extra])).astype(int)
+            position = np.concatenate((position, [(a.position.x, a.position.y) for _, a in extra]))
+            velocity = np.concatenate((velocity, [(a.velocity.x, a.velocity.y) for _, a in extra]))
+            radius = np.concatenate((radius, [a.radius for _, a in extra]))
+        size = len(running)
+        collisions = overlaps(position, radius, groups, size).tolist()
+        speed = np.bincount(groups, np.hypot(velocity[:, 0], velocity[:, 1]), size).tolist()
+        samples = np.bincount(groups, minlength=size).tolist()
+        for n, r in enumerate(running):
+            self.collisions[r] += collisions[n]
+            self.speed[r] += speed[n]
+            self.samples[r] += samples[n]
+
+    def run(self):
+        while self.step():
+            pass
+        return self.results()
+
+    def results(self):
+        """One row per replica, with the metrics of sweep.run_one."""
+        rows = []
+        for r, replica in enumerate(self.replicas):
+            rows.append({
+                "seed": self.seeds[r],
+                "frames": replica.frame,
+                "evac_time": replica.frame * replica.timestep if replica.done() else "",
+                "collisions": self.collisions[r],
+                "mean_speed": self.speed[r] / self.samples[r] if self.samples[r] else 0.0,
+            })
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many seeds of one scenario in lockstep")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--seeds", type=int, default=10, help="number of replicas")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=2000, help="frame limit per replica")
+    parser.add_argument("--config", nargs="*", default=[], metavar="KEY=VALUE", help="CONFIG overrides")
+    parser.add_argument("--timestep", type=float, default=None)
+    parser.add_argument("--ccd", action="store_true")
+    parser.add_argument("--physics", choices=["vector", "compiled"], default="vector")
+    parser.add_argument("--workers", type=int, default=None, help="threads for the vector force phase")
+    parser.add_argument("--out", help="write one CSV row per replica")
+    args = parser.parse_args()
+
+    config = dict((spec.split("=", 1)[0], parse_value(spec.split("=", 1)[1])) for spec in args.config)
+    seeds = range(args.first_seed, args.first_seed + args.seeds)
+    start = time.perf_counter()
+    ensemble = Ensemble(load_scenario(args.scenario), seeds, config, args.timestep, args.ccd, args.frames,
+                        args.physics, args.workers)
+    rows = ensemble.run()
+    seconds = time.perf_counter() - start
+
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    times = [row["evac_time"] for row in rows if row["evac_time"] != ""]
+    print(f"{len(rows)} replicas in {seconds:.1f} s, {len(times)} done within {args.frames} frames")
+    if times:
+        print(f"evac_time mean {np.mean(times):.2f} s, std {np.std(times):.2f} s, "
+              f"min {min(times):.2f} s, max {max(times):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import heapq
+
+class EventQueue:
+    """Min-heap of events on simulated time.
+
+    Each event has a key; scheduling a key again replaces its pending event
+    and ``cancel`` drops it. Replaced events stay in the heap and are
+    skipped when they reach the top.
+    """
+
+    def __init__(self):
+        self.heap = []
+        # tie-breaker for events at the same time; a plain int so queues pickle
+        self.counter = 0
+        self.pending = {}
+
+    def schedule(self, time, key, item=None):
+        seq = self.counter
+        self.counter += 1
+        self.pending[key] = seq
+        heapq.heappush(self.heap, (time, seq, key, item))
+
+    def cancel(self, key):
+        self.pending.pop(key, None)
+
+    def pop_due(self, now):
+        """Remove and return (time, key, item) for every pending event at or before ``now``, soonest first."""
+        due = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            time, seq, key, item = heapq.heappop(heap)
+            if self.pending.get(key) == seq:
+                del self.pending[key]
+                due.append((time, key, item))
+        return due
+
+    def __len__(self):
+        return len(self.pending)
@@ -0,0 +1,63 @@
+import math
+import threading
+from collections import defaultdict
+
+class SpatialGrid:
+    def __init__(self, cell_size=30):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.max_speed = 0
+        self.max_radius = 0
+        self.slack = 0
+        # [queries, agents they returned] per thread since the last rebuild; a force phase split over a
+        # thread pool queries concurrently, so each thread counts its own and readers sum them after the step
+        self.counts = {}
+
+    @property
+    def queries(self):
+        return sum(count[0] for count in self.counts.values())
+
+    @property
+    def candidates(self):
+        return sum(count[1] for count in self.counts.values())
+
+    def cell(self, x, y):
+        return (int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size)))
+
+    def rebuild(self, agents, timestep=0):
+        self.cells.clear()
+        self.max_speed = 0
+        self.max_radius = 0
+        self.counts = {}
+        for agent in agents:
+            self.cells[self.cell(agent.position.x, agent.position.y)].append(agent)
+            self.max_speed = max(self.max_speed, agent.max_speed, agent.velocity.length())
+            self.max_radius = max(self.max_radius, agent.radius)
+        # neighbors updated earlier in the same step may have left their cell
+        self.slack = self.max_speed * timestep
+
+    def reach(self, agent):
+        # beyond this distance time_to_collision cannot fall inside the horizon
+        speed = max(agent.max_speed, agent.velocity.length())
+        return agent.horizon * (speed + self.max_speed) + agent.radius + self.max_radius + self.slack
+
+    def query(self, agent):
+        reach = self.reach(agent)
+        x0, y0 = self.cell(agent.position.x - reach, agent.position.y - reach)
+        x1, y1 = self.cell(agent.position.x + reach, agent.position.y + reach)
+        count = self.counts.setdefault(threading.get_ident(), [0, 0])
+        count[0] += 1
+
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            for (cx, cy), bucket in self.cells.items():
+                if x0 <= cx <= x1 and y0 <= cy <= y1:
+                    count[1] += len(bucket)
+                    yield from bucket
+            return
+
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    count[1] += len(bucket)
+                    yield from bucket
@@ -5,7 +5,9 @@ from wall import Wall
 from physics import update_agent
 import utils
 import random
-import json
+import numpy as np
+from features import get_states
+from shards import ShardWriter
 
 CONFIG = {
     "COUNT": 150,
@@ -22,7 +24,7 @@ SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 600
 TIMESTEP = 0.05
 MAX_FRAMES = 500  # collect 500 frames of data
-K_NEIGHBORS = 5  # how many nearest neighbors to include in state
+DATA_DIR = "bc_data"
 
 pygame.init()
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -31,7 +33,7 @@ clock = pygame.time.Clock()
 agents = []
 walls = []
 frame = 0
-dataset = []  # list of (state, action) pairs
+writer = ShardWriter(DATA_DIR)  # appends (state, action) shards
 
 walls_data = [
     (300, True, Vector2(300, 150)),
@@ -52,33 +54,6 @@ for i in range(CONFIG["COUNT"]):
     agents.append(Agent(i, pos, CONFIG["RADIUS"], max_speed, CONFIG["MAXFORCE"],
                         CONFIG["HORIZON"], CONFIG["K"], CONFIG["AVOID"], CONFIG["SIDESTEP"]))
 
-def get_state(agent, agents, k=K_NEIGHBORS):
-    # state vector, [own_goal_x, own_goal_y, own_vel_x, own_vel_y, 
-    # neighbor_rel_pos_x, neighbor_rel_pos_y, neighbor_rel_vel_x, neighbor_rel_vel_y, ...]
-    # 4 + 4*k dimensions total (zero-pad if fewer than k neighbors)
-
-    goal = agent.target - agent.position
-    own_vel = agent.velocity
-
-    # find k nearest neighbors 
-    neighbors = sorted(
-        [a for a in agents if a.id != agent.id],
-        key=lambda n: (n.position - agent.position).length_squared()
-    )[:k]
-
-    state = [goal.x, goal.y, own_vel.x, own_vel.y]
-
-    for n in neighbors:
-        rel_pos = n.position - agent.position
-        rel_vel = n.velocity - agent.velocity
-        state += [rel_pos.x, rel_pos.y, rel_vel.x, rel_vel.y]
-
-    # zero-pad if fewer than k neighbors
-    while len(state) < 4 + k * 4:
-        state.append(0.0)
-
-    return state
-
 running = True
 print("Collecting data...")
 
@@ -88,7 +63,7 @@ while running and frame < MAX_FRAMES:
             running = False
 
     # collect state before update
-    states = {agent.id: get_state(agent, agents) for agent in agents}
+    states = get_states(agents)
 
     # update agents
     for agent in agents:
@@ -111,12 +86,8 @@ while running and frame < MAX_FRAMES:
             wall.collision_resolve(agent)
 
     # collect action after update: resulting velocity of agents
-    for agent in agents:
-        action = [agent.velocity.x, agent.velocity.y]
-        dataset.append({
-            "state": states[agent.id],
-            "action": action
-        })
+    actions = np.array([(agent.velocity.x, agent.velocity.y) for agent in agents], dtype=np.float32)
+    writer.append(states, actions)
 
     screen.fill((30, 30, 30))
     for wall in walls:
@@ -130,12 +101,11 @@ while running and frame < MAX_FRAMES:
     frame += 1
 
     if frame % 50 == 0:
-        print(f"Frame {frame}/{MAX_FRAMES}, samples collected: {len(dataset)}")
+        print(f"Frame {frame}/{MAX_FRAMES}, samples collected: {writer.written + writer.count}")
 
 pygame.quit()
 
-# save dataset
-with open("bc_data.json", "w") as f:
-    json.dump(dataset, f)
+# save the last partial shard
+samples = writer.close()
 
-print(f"Done. Saved {len(dataset)} state-action pairs to bc_data.json")
+print(f"Done. Saved {samples} state-action pairs to {DATA_DIR}/")
@@ -0,0 +1,107 @@
+"""
+State features shared by data collection and inference.
+
+Each agent's state is [goal_x, goal_y, vel_x, vel_y] followed by the
+relative position and relative velocity of its k nearest neighbors,
+zero-padded when the crowd has fewer than k other agents.
+"""
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+K_NEIGHBORS = 5
+STATE_DIM = 4 + K_NEIGHBORS * 4
+
+
+def nearest(pos, m):
+    """Indices of the m nearest other agents for every row of ``pos``, closest first."""
+    n = len(pos)
+    if cKDTree is not None:
+        _, idx = cKDTree(pos).query(pos, m + 1)
+        idx = idx.reshape(n, m + 1)
+    else:
+        diff = pos[:, None, :] - pos[None, :, :]
+        dist2 = np.einsum("ijk,ijk->ij", diff, diff)
+        idx = np.argpartition(dist2, m, axis=1)[:, :m + 1]
+        order = np.argsort(np.take_along_axis(dist2, idx, axis=1), axis=1, kind="stable")
+        idx = np.take_along_axis(idx, order, axis=1)
+
+    # drop the agent itself; if a coincident neighbor pushed it out, drop the farthest instead
+    keep = idx != np.arange(n)[:, None]
+    keep[keep.all(axis=1), -1] = False
+    return idx[keep].reshape(n, m)
+
+
+def get_states(agents, k=K_NEIGHBORS):
+    n = len(agents)
+    pos = np.array([(a.position.x, a.position.y) for a in agents], dtype=np.float64).reshape(n, 2)
+    vel = np.array([(a.velocity.x, a.velocity.y) for a in agents], dtype=np.float64).reshape(n, 2)
+    target = np.array([(a.target.x, a.target.y) for a in agents], dtype=np.float64).reshape(n, 2)
+
+    states = np.zeros((n, 4 + 4 * k), dtype=np.float32)
+    states[:, 0:2] = target - pos
+    states[:, 2:4] = vel
+
+    m = min(k, n - 1)
+    if m > 0:
+        idx = nearest(pos, m)
+        rel_pos = pos[idx] - pos[:, None, :]
+        rel_vel = vel[idx] - vel[:, None, :]
+        states[:, 4:4 + 4 * m] = np.concatenate((rel_pos, rel_vel), axis=2).reshape(n, 4 * m)
+    return states
+
+
+class FrameStates:
+    """Single-agent states for an in-order update, with one k-d tree per frame.
+
+    The tree holds the positions at construction. Since then every agent has
+    moved at most ``drift``, so a ball query widened by twice that still
+    holds the true nearest neighbors, which are then ranked by current
+    distance. Call ``moved(i)`` once agent i has been updated.
+    """
+
+    def __init__(self, agents, k=K_NEIGHBORS):
+        n = len(agents)
+        self.agents = agents
+        self.k = k
+        self.pos = np.array([(a.position.x, a.position.y) for a in agents], dtype=np.float64).reshape(n, 2)
+        self.vel = np.array([(a.velocity.x, a.velocity.y) for a in agents], dtype=np.float64).reshape(n, 2)
+        self.start = self.pos.copy()
+        self.drift = 0.0
+        self.tree = cKDTree(self.start) if cKDTree is not None and n else None
+
+    def neighbors(self, i, m):
+        """Indices of the m nearest other agents to agent i, closest first."""
+        if self.tree is None:
+            candidates = np.arange(len(self.pos))
+        else:
+            dist, _ = self.tree.query(self.pos[i], m + 1)
+            # a little slack, as the ball query's distances round differently from query's
+            radius = dist[-1] * (1 + 1e-9) + 2 * self.drift
+            candidates = np.array(self.tree.query_ball_point(self.pos[i], radius), dtype=int)
+        candidates = candidates[candidates != i]
+        diff = self.pos[candidates] - self.pos[i]
+        dist2 = np.einsum("ij,ij->i", diff, diff)
+        return candidates[np.argsort(dist2, kind="stable")[:m]]
+
+    def state(self, i):
+        """Row i of get_states(agents) for the agents as they are now."""
+        agent = self.agents[i]
+        state = np.zeros(4 + 4 * self.k, dtype=np.float32)
+        state[0:2] = (agent.target.x - self.pos[i, 0], agent.target.y - self.pos[i, 1])
+        state[2:4] = self.vel[i]
+        m = min(self.k, len(self.pos) - 1)
+        if m > 0:
+            idx = self.neighbors(i, m)
+            state[4:4 + 4 * m] = np.concatenate((self.pos[idx] - self.pos[i], self.vel[idx] - self.vel[i]), axis=1).ravel()
+        return state
+
+    def moved(self, i):
+        agent = self.agents[i]
+        self.pos[i] = (agent.position.x, agent.position.y)
+        self.vel[i] = (agent.velocity.x, agent.velocity.y)
+        self.drift = max(self.drift, float(np.hypot(*(self.pos[i] - self.start[i]))))
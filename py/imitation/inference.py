@@ -1,3 +1,5 @@
+import argparse
+import os
 import pygame
 from pygame.math import Vector2
 from agent import Agent
@@ -7,6 +9,7 @@ import random
 import numpy as np
 import torch
 import torch.nn as nn
+from features import get_states, FrameStates, STATE_DIM
 
 CONFIG = {
     "COUNT": 150,
@@ -22,8 +25,6 @@ CONFIG = {
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 600
 TIMESTEP = 0.05
-K_NEIGHBORS = 5
-STATE_DIM = 4 + K_NEIGHBORS * 4
 ACTION_DIM = 2
 HIDDEN_DIM = 128
 
@@ -45,6 +46,17 @@ class BCPolicy(nn.Module):
         return self.net(x)
 
 
+parser = argparse.ArgumentParser(description="Run the BC policy in the room scenario")
+parser.add_argument("--backend", choices=["eager", "torchscript", "onnx"], default="eager",
+                    help="how to run the policy for the batched path")
+parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+parser.add_argument("--no-inference-mode", action="store_true", help="use torch.no_grad instead of torch.inference_mode")
+parser.add_argument("--per-agent", action="store_true", help="one forward pass per agent instead of one per frame")
+args = parser.parse_args()
+
+if args.threads:
+    torch.set_num_threads(args.threads)
+
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 model = BCPolicy(STATE_DIM, ACTION_DIM, HIDDEN_DIM).to(device)
 model.load_state_dict(torch.load("bc_policy.pt", map_location=device))
@@ -56,30 +68,44 @@ state_std = stats["state_std"]
 action_mean = stats["action_mean"]
 action_std = stats["action_std"]
 
-print("Model loaded.")
 
 
-def get_state(agent, agents, k=K_NEIGHBORS):
-    goal = agent.target - agent.position
-    own_vel = agent.velocity
-    neighbors = sorted(
-        [a for a in agents if a.id != agent.id],
-        key=lambda n: (n.position - agent.position).length_squared()
-    )[:k]
+def load_policy(backend):
+    # returns a function mapping a normalized (N, STATE_DIM) float32 array to (N, ACTION_DIM)
+    grad_mode = torch.no_grad if args.no_inference_mode else torch.inference_mode
+
+    if backend == "onnx":
+        import onnxruntime
+        # re-export after train_bc.py saves new weights, or the session would serve the old ones
+        if not os.path.exists("bc_policy.onnx") or os.path.getmtime("bc_policy.onnx") < os.path.getmtime("bc_policy.pt"):
+            torch.onnx.export(model.cpu(), torch.zeros(1, STATE_DIM), "bc_policy.onnx",
+                              input_names=["state"], output_names=["action"],
+                              dynamic_axes={"state": {0: "batch"}, "action": {0: "batch"}})
+            model.to(device)
+        options = onnxruntime.SessionOptions()
+        if args.threads:
+            options.intra_op_num_threads = args.threads
+        session = onnxruntime.InferenceSession("bc_policy.onnx", options, providers=["CPUExecutionProvider"])
+        return lambda states: session.run(None, {"state": states})[0]
+
+    net = model
+    if backend == "torchscript":
+        with torch.no_grad():
+            net = torch.jit.freeze(torch.jit.trace(model, torch.zeros(1, STATE_DIM, device=device)))
+
+    def policy(states):
+        with grad_mode():
+            return net(torch.from_numpy(states).to(device)).cpu().numpy()
+    return policy
+
 
-    state = [goal.x, goal.y, own_vel.x, own_vel.y]
-    for n in neighbors:
-        rel_pos = n.position - agent.position
-        rel_vel = n.velocity - agent.velocity
-        state += [rel_pos.x, rel_pos.y, rel_vel.x, rel_vel.y]
-    while len(state) < 4 + k * 4:
-        state.append(0.0)
-    return state
+policy = load_policy(args.backend)
+
+print("Model loaded.")
 
 
-def bc_update_agent(agent, agents, timestep):
+def bc_update_agent(agent, state, timestep):
     # normalize state
-    state = get_state(agent, agents)
     state_norm = (np.array(state, dtype=np.float32) - state_mean) / state_std
     state_t = torch.FloatTensor(state_norm).unsqueeze(0).to(device)
 
@@ -97,6 +123,22 @@ def bc_update_agent(agent, agents, timestep):
     agent.position += agent.velocity * timestep
 
 
+def bc_update_agents(agents, timestep):
+    # one forward pass for the whole crowd; every agent sees the same snapshot
+    states = get_states(agents)
+    states_norm = ((states - state_mean) / state_std).astype(np.float32)
+    actions = policy(states_norm) * action_std + action_mean
+
+    speed = np.linalg.norm(actions, axis=1)
+    max_speed = np.array([agent.max_speed for agent in agents])
+    over = speed > max_speed
+    actions[over] *= (max_speed[over] / speed[over])[:, None]
+
+    for agent, (vx, vy) in zip(agents, actions.tolist()):
+        agent.velocity = Vector2(vx, vy)
+        agent.position += agent.velocity * timestep
+
+
 pygame.init()
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 clock = pygame.time.Clock()
@@ -148,8 +190,14 @@ while running:
             if agent.position.y >= 375:
                 agent.target.y = 900
 
-        for agent in agents:
-            bc_update_agent(agent, agents, TIMESTEP)
+        if args.per_agent:
+            # in order: each agent sees the ones before it already moved
+            frame = FrameStates(agents)
+            for i, agent in enumerate(agents):
+                bc_update_agent(agent, frame.state(i), TIMESTEP)
+                frame.moved(i)
+        else:
+            bc_update_agents(agents, TIMESTEP)
 
         for agent in agents:
             for wall in walls:
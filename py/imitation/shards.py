@@ -0,0 +1,84 @@
+"""
+Append-only float32 shards of (state, action) pairs for behavioral cloning.
+
+A dataset directory holds states_NNNNN.npy / actions_NNNNN.npy pairs.
+Collection appends new shards after the existing ones; training memory-maps
+them one at a time, so nothing has to fit in RAM at once.
+"""
+
+import glob
+import os
+import numpy as np
+from features import STATE_DIM
+
+ACTION_DIM = 2
+SHARD_SIZE = 65536
+
+
+class ShardWriter:
+    def __init__(self, path, shard_size=SHARD_SIZE, state_dim=STATE_DIM, action_dim=ACTION_DIM):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.shard = len(list_shards(path))
+        self.count = 0
+        self.written = 0
+        self.states = np.zeros((shard_size, state_dim), dtype=np.float32)
+        self.actions = np.zeros((shard_size, action_dim), dtype=np.float32)
+
+    def append(self, states, actions):
+        start = 0
+        while start < len(states):
+            take = min(len(states) - start, len(self.states) - self.count)
+            self.states[self.count:self.count + take] = states[start:start + take]
+            self.actions[self.count:self.count + take] = actions[start:start + take]
+            self.count += take
+            start += take
+            if self.count == len(self.states):
+                self.flush()
+
+    def flush(self):
+        if not self.count:
+            return
+        np.save(os.path.join(self.path, f"states_{self.shard:05d}.npy"), self.states[:self.count])
+        np.save(os.path.join(self.path, f"actions_{self.shard:05d}.npy"), self.actions[:self.count])
+        self.written += self.count
+        self.shard += 1
+        self.count = 0
+
+    def close(self):
+        self.flush()
+        return self.written
+
+
+def list_shards(path):
+    states = sorted(glob.glob(os.path.join(path, "states_*.npy")))
+    return [(s, s.replace("states_", "actions_")) for s in states]
+
+
+def load_shard(shard):
+    states, actions = shard
+    return np.load(states, mmap_mode="r"), np.load(actions, mmap_mode="r")
+
+
+def norm_stats(shards):
+    """Mean and std of states and actions, merged shard by shard (Chan et al.)."""
+    stats = {}
+    for name, column in (("state", 0), ("action", 1)):
+        n = 0
+        mean = 0.0
+        m2 = 0.0
+        for shard in shards:
+            data = np.asarray(load_shard(shard)[column], dtype=np.float64)
+            count = len(data)
+            if not count:
+                continue
+            shard_mean = data.mean(axis=0)
+            shard_m2 = ((data - shard_mean) ** 2).sum(axis=0)
+            delta = shard_mean - mean
+            total = n + count
+            mean = mean + delta * count / total
+            m2 = m2 + shard_m2 + delta ** 2 * n * count / total
+            n = total
+        stats[f"{name}_mean"] = np.asarray(mean, dtype=np.float32)
+        stats[f"{name}_std"] = np.asarray(np.sqrt(m2 / max(n, 1)) + 1e-8, dtype=np.float32)
+    return stats
@@ -1,39 +1,97 @@
 """
 Train a behavioral cloning policy on the collected crowd simulation data.
-Run collect_data.py first to generate bc_data.json.
+Run collect_data.py first to generate the bc_data/ shards.
 
 Install dependencies:
     pip install torch numpy
 """
 
-import json
 import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import IterableDataset, DataLoader, get_worker_info
+from features import STATE_DIM
+from shards import list_shards, load_shard, norm_stats
 
 # ── Config ──────────────────────────────────────────────────────────────────
-K_NEIGHBORS = 5
-STATE_DIM = 4 + K_NEIGHBORS * 4   # 24
 ACTION_DIM = 2                     # vel_x, vel_y
 HIDDEN_DIM = 128
 BATCH_SIZE = 256
 EPOCHS = 50
 LR = 1e-3
 TRAIN_SPLIT = 0.9
+SPLIT_SEED = 0                     # fixes which rows are held out for validation
+SHUFFLE_BUFFER = 262144            # rows mixed across shards before batching
+DATA_DIR = "bc_data"
+WORKERS = 0
 
 
 # ── Dataset ──────────────────────────────────────────────────────────────────
-class CrowdDataset(Dataset):
-    def __init__(self, states, actions):
-        self.states = torch.FloatTensor(states)
-        self.actions = torch.FloatTensor(actions)
+class CrowdDataset(IterableDataset):
+    """Streams normalized batches from memory-mapped shards.
+
+    A seeded permutation of every shard's rows puts TRAIN_SPLIT of them in
+    training and the rest in validation, so both cover whole episodes
+    rather than validation being the end of each one. The split of a shard
+    depends only on its position, so appending shards leaves it unchanged.
+    With ``shuffle`` shards are read in random order into a buffer of
+    ``buffer_size`` rows, which is shuffled before batches are taken from
+    it, so a batch mixes rows of several shards.
+    """
+
+    def __init__(self, shards, stats, train, shuffle=False, batch_size=BATCH_SIZE, buffer_size=SHUFFLE_BUFFER):
+        self.shards = shards
+        self.stats = stats
+        self.train = train
+        self.shuffle = shuffle
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+
+    def rows(self, index, n):
+        order = np.random.default_rng((SPLIT_SEED, index)).permutation(n)
+        split = int(n * TRAIN_SPLIT)
+        return np.sort(order[:split] if self.train else order[split:])
 
     def __len__(self):
-        return len(self.states)
-
-    def __getitem__(self, idx):
-        return self.states[idx], self.actions[idx]
+        return sum(len(self.rows(i, len(load_shard(shard)[0]))) for i, shard in enumerate(self.shards))
+
+    def batches(self, states, actions):
+        for start in range(0, len(states), self.batch_size):
+            s = (states[start:start + self.batch_size] - self.stats["state_mean"]) / self.stats["state_std"]
+            a = (actions[start:start + self.batch_size] - self.stats["action_mean"]) / self.stats["action_std"]
+            yield torch.from_numpy(s.astype(np.float32)), torch.from_numpy(a.astype(np.float32))
+
+    def __iter__(self):
+        shards = list(enumerate(self.shards))
+        worker = get_worker_info()
+        if worker is not None:
+            shards = shards[worker.id::worker.num_workers]
+        if not self.shuffle:
+            for index, shard in shards:
+                states, actions = load_shard(shard)
+                rows = self.rows(index, len(states))
+                yield from self.batches(states[rows], actions[rows])
+            return
+
+        np.random.shuffle(shards)
+        held_states, held_actions = [], []
+        held = 0
+        for i, (index, shard) in enumerate(shards):
+            states, actions = load_shard(shard)
+            rows = self.rows(index, len(states))
+            held_states.append(states[rows])
+            held_actions.append(actions[rows])
+            held += len(rows)
+            last = i == len(shards) - 1
+            if held < self.buffer_size and not last:
+                continue
+            states, actions = np.concatenate(held_states), np.concatenate(held_actions)
+            order = np.random.permutation(len(states))
+            # keep half the buffer to mix with the next shards, in whole batches
+            out = len(states) if last else len(states) // 2 // self.batch_size * self.batch_size
+            yield from self.batches(states[order[:out]], actions[order[:out]])
+            held_states, held_actions = [states[order[out:]]], [actions[order[out:]]]
+            held = len(states) - out
 
 
 # ── Model ────────────────────────────────────────────────────────────────────
@@ -56,42 +114,18 @@ class BCPolicy(nn.Module):
 
 # ── Load data ────────────────────────────────────────────────────────────────
 print("Loading data...")
-with open("bc_data.json") as f:
-    data = json.load(f)
-
-states = np.array([d["state"] for d in data], dtype=np.float32)
-actions = np.array([d["action"] for d in data], dtype=np.float32)
-print(f"Loaded {len(states)} samples. State dim: {states.shape[1]}, Action dim: {actions.shape[1]}")
+shards = list_shards(DATA_DIR)
+stats = norm_stats(shards)
 
-# Normalize
-state_mean = states.mean(axis=0)
-state_std = states.std(axis=0) + 1e-8
-action_mean = actions.mean(axis=0)
-action_std = actions.std(axis=0) + 1e-8
+# Save normalization stats for inference later
+np.save("norm_stats.npy", stats)
 
-states_norm = (states - state_mean) / state_std
-actions_norm = (actions - action_mean) / action_std
+train_ds = CrowdDataset(shards, stats, train=True, shuffle=True)
+val_ds = CrowdDataset(shards, stats, train=False)
+train_loader = DataLoader(train_ds, batch_size=None, num_workers=WORKERS)
+val_loader = DataLoader(val_ds, batch_size=None, num_workers=WORKERS)
 
-# Save normalization stats for inference later
-np.save("norm_stats.npy", {
-    "state_mean": state_mean,
-    "state_std": state_std,
-    "action_mean": action_mean,
-    "action_std": action_std
-})
-
-# Train/val split
-n = len(states_norm)
-split = int(n * TRAIN_SPLIT)
-idx = np.random.permutation(n)
-train_idx, val_idx = idx[:split], idx[split:]
-
-train_ds = CrowdDataset(states_norm[train_idx], actions_norm[train_idx])
-val_ds = CrowdDataset(states_norm[val_idx], actions_norm[val_idx])
-train_loader = DataLoader(train_ds, batch_size=BATCH_SIZE, shuffle=True)
-val_loader = DataLoader(val_ds, batch_size=BATCH_SIZE)
-
-print(f"Train: {len(train_ds)} samples | Val: {len(val_ds)} samples")
+print(f"Train: {len(train_ds)} samples | Val: {len(val_ds)} samples in {len(shards)} shards")
 
 
 # ── Train ────────────────────────────────────────────────────────────────────
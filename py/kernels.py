@@ -0,0 +1,165 @@
+"""
+Optional Numba kernels for the TTC step over flat float64 arrays.
+
+With Numba installed the kernels are compiled and the per-agent loops run
+in parallel. Without it ``CompiledStepper`` falls back to
+physics.update_agents_sync, which computes the same synchronous step.
+tests/test_kernels.py checks the kernels against physics.py.
+"""
+
+import math
+import numpy as np
+from crowd import Crowd, cell_index
+from grid import SpatialGrid
+from physics import update_agents_sync
+
+try:
+    from numba import njit, prange, set_num_threads
+except ImportError:
+    njit = None
+    prange = range
+    set_num_threads = None
+
+AVAILABLE = njit is not None
+EPSILON = 1e-6
+
+
+def jit(parallel=False):
+    if njit is None:
+        return lambda f: f
+    return njit(cache=True, parallel=parallel)
+
+
+@jit()
+def time_to_collision(px, py, vx, vy, r, qx, qy, ux, uy, s):
+    rad = r + s
+    wx = qx - px
+    wy = qy - py
+    c = wx * wx + wy * wy - rad * rad
+    if c < 0:
+        return 0.0
+    ax = vx - ux
+    ay = vy - uy
+    a = ax * ax + ay * ay
+    b = wx * ax + wy * ay
+    discriminant = b * b - a * c
+    if discriminant <= 0 or a == 0:
+        return math.inf
+    tau = (b - math.sqrt(discriminant)) / a
+    return tau if tau >= 0 else math.inf
+
+
+@jit(parallel=True)
+def accumulate_forces(pos, vel, target, ids, group, radius, max_speed, horizon, k, avoid, sidestep,
+                      origin, size, shape, start, order, fastest, widest, force):
+    for i in prange(len(pos)):
+        px, py = pos[i, 0], pos[i, 1]
+        vx, vy = vel[i, 0], vel[i, 1]
+        fx = k[i] * (target[i, 0] - px - vx)
+        fy = k[i] * (target[i, 1] - py - vy)
+
+        # same bound as SpatialGrid.reach
+        speed = max(max_speed[i], math.sqrt(vx * vx + vy * vy))
+        reach = horizon[i] * (speed + fastest) + radius[i] + widest
+        x0 = max(int(math.floor((px - reach - origin[0]) / size)), 0)
+        x1 = min(int(math.floor((px + reach - origin[0]) / size)), shape[0] - 1)
+        y0 = max(int(math.floor((py - reach - origin[1]) / size)), 0)
+        y1 = min(int(math.floor((py + reach - origin[1]) / size)), shape[1] - 1)
+        base = group[i] * shape[0]
+
+        fx_avoid = fy_avoid = 0.0
+        fx_sidestep = fy_sidestep = 0.0
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = (base + cx) * shape[1] + cy
+                for s in range(start[cell], start[cell + 1]):
+                    j = order[s]
+                    if ids[j] == ids[i]:
+                        continue
+                    t = time_to_collision(px, py, vx, vy, radius[i], pos[j, 0], pos[j, 1], vel[j, 0], vel[j, 1], radius[j])
+                    if t > horizon[i]:
+                        continue
+
+                    dx = px - pos[j, 0]
+                    dy = py - pos[j, 1]
+                    dist = math.sqrt(dx * dx + dy * dy)
+                    if dist > 0:
+                        dx /= dist
+                        dy /= dist
+                    else:
+                        dx, dy = 1.0, 0.0
+
+                    # left = (-dy, dx), right = (dy, -dx)
+                    if -dy * vel[j, 0] + dx * vel[j, 1] < dy * vel[j, 0] - dx * vel[j, 1]:
+                        sx, sy = -dy, dx
+                    else:
+                        sx, sy = dy, -dx
+
+                    w = (horizon[i] - t) / (t + EPSILON)
+                    fx_avoid += avoid[i] * dx * w
+                    fy_avoid += avoid[i] * dy * w
+                    fx_sidestep += sidestep[i] * sx * w
+                    fy_sidestep += sidestep[i] * sy * w
+
+        force[i, 0] = fx + fx_avoid + fx_sidestep
+        force[i, 1] = fy + fy_avoid + fy_sidestep
+
+
+@jit(parallel=True)
+def apply_forces(pos, vel, force, max_force, max_speed, timestep):
+    for i in prange(len(pos)):
+        fx, fy = force[i, 0], force[i, 1]
+        magnitude = math.sqrt(fx * fx + fy * fy)
+        if magnitude > max_force[i]:
+            fx = fx / magnitude * max_force[i]
+            fy = fy / magnitude * max_force[i]
+        vx = vel[i, 0] + fx * timestep
+        vy = vel[i, 1] + fy * timestep
+        speed = math.sqrt(vx * vx + vy * vy)
+        if speed > max_speed[i]:
+            vx = vx / speed * max_speed[i]
+            vy = vy / speed * max_speed[i]
+        vel[i, 0] = vx
+        vel[i, 1] = vy
+        pos[i, 0] += vx * timestep
+        pos[i, 1] += vy * timestep
+
+
+def crowd_forces(crowd, cell_size=30):
+    """Goal, avoid and sidestep force on every agent of a ``Crowd``."""
+    _, shape, order, start, origin, size = cell_index(crowd.position, cell_size, crowd.group)
+    fastest = max(np.hypot(crowd.velocity[:, 0], crowd.velocity[:, 1]).max(), crowd.max_speed.max())
+    force = np.empty_like(crowd.position)
+    accumulate_forces(crowd.position, crowd.velocity, crowd.target, crowd.ids, crowd.group, crowd.radius,
+                      crowd.max_speed, crowd.horizon, crowd.k, crowd.avoid, crowd.sidestep,
+                      origin, size, shape, start, order, fastest, crowd.radius.max(), force)
+    return force
+
+
+def step_crowd(crowd, timestep, cell_size=30):
+    """One synchronous step of a ``Crowd`` with the kernels."""
+    if not crowd.count:
+        return
+    force = crowd_forces(crowd, cell_size)
+    apply_forces(crowd.position, crowd.velocity, force, crowd.max_force, crowd.max_speed, timestep)
+
+
+class CompiledStepper:
+    """``update_agents_sync`` for a list of agents, compiled when Numba is available."""
+
+    def __init__(self, cell_size=30):
+        self.cell_size = cell_size
+        self.crowd = None
+        self.grid = SpatialGrid(cell_size)
+
+    def step(self, agents, timestep):
+        if not AVAILABLE:
+            self.grid.rebuild(agents)
+            update_agents_sync(agents, self.grid, timestep)
+            return
+        if self.crowd is None or self.crowd.count != len(agents):
+            self.crowd = Crowd(len(agents))
+        self.crowd.load(agents)
+        step_crowd(self.crowd, timestep, self.cell_size)
+        self.crowd.store(agents)
+
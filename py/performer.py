@@ -1,11 +1,14 @@
 import pygame
 from pygame.math import Vector2
 from agent import Agent
-from physics import update_agent
+from simulation import Scenario, main
 import utils
 import random
 import numpy as np
-from poisson_disc import Bridson_sampling
+from functools import partial
+from regions import Region, Source
+from slots import SlotAllocator
+from sampling import Annulus, bridson, cached
 
 CONFIG = {
     "COUNT": 50,
@@ -20,108 +23,88 @@ CONFIG = {
     "MAXCOMFORT": 75,
     "wAgent": 30,
     "wPerformer": 80,
+    "RATE": 1.5,
+    "POOL": 50,
 }
 
-SCREEN_WIDTH = 600
-SCREEN_HEIGHT = 600
 LENGTH = 300
+# the street runs between the sinks at x <= 150 and x >= 450
+EXITS = (130, 470)
 EPSILON = 0.01
-TIMESTEP = 0.05
-
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-clock = pygame.time.Clock()
-
-agents = []
-points = []
-viewer_counts = {}
-positions = {}
-frame = 0
-selected = None
-performer = Vector2(300, 435)
-
-def weighted_score(point, agent, performer):
-    return CONFIG["wAgent"] * point.distance_to(agent.position) + CONFIG["wPerformer"] * point.distance_to(performer)
-
-def generate_viewing_position(agent):
-    if not points:
-        return Vector2(300, 300)
-    sorted_points = sorted(points, key=lambda p: weighted_score(p, agent, performer), reverse=True)
-    best_point = sorted_points[-1]
-    points.remove(best_point)
-    return best_point.copy()
-
-def init():
-    global points, agents
-    for i in range(CONFIG["COUNT"]):
-        pos = utils.get_position(105, 495, 255, 345)
-        max_speed = random.uniform(15, CONFIG["MAXSPEED"])
-        target_x = 150 if random.random() < 0.5 else 450
-        agent = Agent(
-            i, pos, CONFIG["RADIUS"], max_speed, CONFIG["MAXFORCE"],
-            CONFIG["HORIZON"], CONFIG["K"], CONFIG["AVOID"], CONFIG["SIDESTEP"]
-        )
-        agent.target = Vector2(target_x, pos.y)
-        agent.data["state"] = "WALKING"
-        agents.append(agent)
 
-    points_data = Bridson_sampling(np.array([600, 600]), radius=2 * CONFIG["RADIUS"], k=20)
-    points = [Vector2(x, y) for x, y in points_data]
-    points = [p for p in points if CONFIG["MINCOMFORT"] < p.distance_to(performer) < CONFIG["MAXCOMFORT"]]
+class Performer(Scenario):
+    """Street performer"""
+    CONFIG = CONFIG
 
-init()
+    def generate_viewing_position(self, agent):
+        slot = self.points.acquire(agent.position, self.config["wAgent"], self.performer, self.config["wPerformer"])
+        return Vector2(300, 300) if slot is None else self.points.point(slot)
 
-running = True
-prev_time = pygame.time.get_ticks()
+    def make_agent(self, i, pos=None):
+        config = self.config
+        return Agent(
+            i, pos or Vector2(), config["RADIUS"], random.uniform(15, config["MAXSPEED"]), config["MAXFORCE"],
+            config["HORIZON"], config["K"], config["AVOID"], config["SIDESTEP"]
+        )
+
+    def walk(self, exit_x, agent):
+        agent.max_speed = random.uniform(15, self.config["MAXSPEED"])
+        agent.horizon = self.config["HORIZON"]
+        agent.target.update(exit_x, agent.position.y)
+        agent.data["state"] = "WALKING"
 
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
+    def setup(self):
+        config = self.config
+        self.selected = None
+        self.performer = Vector2(300, 435)
+
+        for i in range(config["COUNT"]):
+            agent = self.make_agent(i, utils.get_position(155, 445, 255, 345))
+            self.walk(random.choice(EXITS), agent)
+            self.agents.append(agent)
+
+        # walkers leave at either end of the street and new ones arrive from the pool
+        self.preallocate(config["POOL"], self.make_agent)
+        self.sinks += [Region(right=150), Region(left=450)]
+        self.sources += [Source(Region(152, 255, 162, 345), config["RATE"], init=partial(self.walk, EXITS[1])),
+                         Source(Region(438, 255, 448, 345), config["RATE"], init=partial(self.walk, EXITS[0]))]
+
+        # viewing points fill the comfort band around the performer
+        band = Annulus(self.performer, config["MINCOMFORT"], config["MAXCOMFORT"])
+        seed = self.seed or 0
+        points = cached(["performer", band.key(), 2 * config["RADIUS"], seed],
+                        lambda: {"points": bridson(band, 2 * config["RADIUS"], 20, np.random.default_rng(seed))})
+        self.points = SlotAllocator(points["points"])
+
+    def handle(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
             mouse_pos = Vector2(pygame.mouse.get_pos())
-            selected = None
-            for agent in agents:
-                if agent.position.distance_to(mouse_pos) < CONFIG["RADIUS"]:
-                    selected = agent.id
+            self.selected = None
+            for agent in self.active:
+                if agent.position.distance_to(mouse_pos) < self.config["RADIUS"]:
+                    self.selected = agent.id
                     break
 
-    current_time = pygame.time.get_ticks()
-    delta = (current_time - prev_time) / 1000.0
-    prev_time = current_time
-
-    for agent in agents:
-        if agent.position.x < 150:
-            agent.position.x = 450
-            agent.position.y = 600 - agent.position.y
-            agent.target.y = 600 - agent.target.y
-        elif agent.position.x > 450:
-            agent.position.x = 150
-            agent.position.y = 600 - agent.position.y
-            agent.target.y = 600 - agent.target.y
-
-        if selected is not None and agent.id == selected and agent.data["state"] == "WALKING":
-            agent.data["state"] = "VIEWING"
-            agent.target = generate_viewing_position(agent)
-
-        if agent.data["state"] == "VIEWING" and agent.position.y > 360:
-            agent.horizon = 3
-
-        update_agent(agent, agents, TIMESTEP)
+    def update(self, dt):
+        for agent in self.active:
+            if self.selected is not None and agent.id == self.selected and agent.data["state"] == "WALKING":
+                agent.data["state"] = "VIEWING"
+                agent.target = self.generate_viewing_position(agent)
 
-    frame += 1
-    positions[frame] = {agent.id: (agent.position.x, agent.position.y) for agent in agents}
+            if agent.data["state"] == "VIEWING" and agent.position.y > 360:
+                agent.horizon = 3
 
-    screen.fill((30, 30, 30))
-    pygame.draw.rect(screen, (34, 34, 34), (150, 255, 300, 90))
+    def agent_color(self, agent):
+        return (0, 0, 255) if agent.data["state"] == "VIEWING" else (0, 255, 0)
 
-    pygame.draw.circle(screen, (255, 0, 0), (int(performer.x), int(performer.y)), 5)
+    def draw(self, screen):
+        screen.fill((30, 30, 30))
+        pygame.draw.rect(screen, (34, 34, 34), (150, 255, 300, 90))
 
-    for agent in agents:
-        color = (0, 0, 255) if agent.data["state"] == "VIEWING" else (0, 255, 0)
-        pygame.draw.circle(screen, color, (int(agent.position.x), int(agent.position.y)), int(agent.radius))
+        pygame.draw.circle(screen, (255, 0, 0), (int(self.performer.x), int(self.performer.y)), 5)
 
-    pygame.display.flip()
-    clock.tick(60)
+        for agent in self.active:
+            pygame.draw.circle(screen, self.agent_color(agent), (int(agent.position.x), int(agent.position.y)), int(agent.radius))
 
-pygame.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main(Performer)
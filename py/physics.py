@@ -1,5 +1,6 @@
 import math
 from pygame.math import Vector2
+from grid import SpatialGrid
 
 EPSILON = 1e-6
 
@@ -26,7 +27,7 @@ def apply_force(agent, f, timestep):
         agent.velocity = agent.velocity.normalize() * agent.max_speed
     agent.position += agent.velocity * timestep
 
-def update_agent(agent, agents, timestep):
+def agent_force(agent, agents):
     agent.goal = agent.target - agent.position
     fx_goal = agent.k * (agent.goal.x - agent.velocity.x)
     fy_goal = agent.k * (agent.goal.y - agent.velocity.y)
@@ -34,7 +35,9 @@ def update_agent(agent, agents, timestep):
     fx_avoid = fy_avoid = 0
     fx_sidestep = fy_sidestep = 0
 
-    for neighbor in agents:
+    neighbors = agents.query(agent) if isinstance(agents, SpatialGrid) else agents
+
+    for neighbor in neighbors:
         if neighbor.id == agent.id:
             continue
         t = time_to_collision(agent, neighbor)
@@ -58,4 +61,24 @@ def update_agent(agent, agents, timestep):
 
     fx = fx_goal + fx_avoid + fx_sidestep
     fy = fy_goal + fy_avoid + fy_sidestep
-    apply_force(agent, Vector2(fx, fy), timestep)
\ No newline at end of file
+    return Vector2(fx, fy)
+
+def update_agent(agent, agents, timestep):
+    apply_force(agent, agent_force(agent, agents), timestep)
+
+def update_agents_sync(agents, neighbors, timestep, pool=None, chunk=64):
+    """Synchronous step: every force is computed from the same snapshot, then all are applied.
+
+    Forces only read positions and velocities, so the force phase can be
+    split over ``pool`` (an Executor) and the result does not depend on
+    list order or worker count.
+    """
+    if pool is None:
+        forces = [agent_force(agent, neighbors) for agent in agents]
+    else:
+        chunks = [agents[i:i + chunk] for i in range(0, len(agents), chunk)]
+        forces = [f for part in pool.map(lambda part: [agent_force(agent, neighbors) for agent in part], chunks)
+                  for f in part]
+
+    for agent, force in zip(agents, forces):
+        apply_force(agent, force, timestep)
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+Per-phase timing of the simulation loop.
+
+Enable with ``--profile [PATH]`` on any scenario script or by setting
+CROWD_PROFILE. A report is printed when the run ends; with a PATH ending
+in .csv or .json the per-frame timeline is written there as well, one row
+as each frame ends, so long runs keep only running totals in memory.
+"""
+
+import csv
+import json
+import os
+import time
+from contextlib import contextmanager
+
+PHASES = ["update", "forces", "walls", "lifecycle", "record", "draw"]
+COUNTERS = ["active", "candidates", "ttc", "wall_tests"]
+
+
+def from_env():
+    """A Profiler configured by CROWD_PROFILE, or None when it is unset."""
+    value = os.environ.get("CROWD_PROFILE")
+    if value is None:
+        return None
+    return Profiler(value if value.endswith((".csv", ".json")) else None)
+
+
+class Profiler:
+    def __init__(self, path=None):
+        self.path = path
+        self.file = None
+        self.writer = None
+        if path:
+            self.file = open(path, "w", newline="")
+            if path.endswith(".json"):
+                self.file.write("[")
+            else:
+                self.writer = csv.DictWriter(self.file, ["frame", "time"] + PHASES + COUNTERS)
+                self.writer.writeheader()
+        self.frames = 0
+        self.total = dict.fromkeys(PHASES, 0.0)
+        self.agents = 0
+        # sum and number of frames that counted it, per counter
+        self.counted = {name: [0, 0] for name in COUNTERS}
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[name] += time.perf_counter() - start
+
+    def end_frame(self, scenario):
+        row = {"frame": scenario.frame, "time": scenario.time}
+        row.update((name, seconds * 1000) for name, seconds in self.current.items())
+        row.update(scenario.counters())
+        self.frames += 1
+        for name in PHASES:
+            self.total[name] += row[name]
+        self.agents += row["active"]
+        for name in COUNTERS:
+            if row[name] is not None:
+                self.counted[name][0] += row[name]
+                self.counted[name][1] += 1
+        self.write(row)
+        self.current = dict.fromkeys(PHASES, 0.0)
+
+    def write(self, row):
+        if self.writer:
+            self.writer.writerow(row)
+        elif self.file:
+            self.file.write(("," if self.frames > 1 else "") + json.dumps(row))
+
+    def report(self):
+        frames = self.frames
+        if not frames:
+            return "no frames profiled"
+        wall = time.perf_counter() - self.started
+        total = self.total
+        timed = sum(total.values()) or 1.0
+        lines = [f"{frames} frames in {wall:.2f} s ({frames / wall:.1f} frames/s)",
+                 f"{'phase':<10} {'total s':>9} {'ms/frame':>9} {'share':>7}"]
+        for name in PHASES:
+            lines.append(f"{name:<10} {total[name] / 1000:>9.3f} {total[name] / frames:>9.3f} {total[name] / timed:>7.1%}")
+
+        lines.append(f"{'counter':<10} {'per frame':>9} {'per agent':>9}")
+        agents = self.agents or 1
+        for name in COUNTERS:
+            value, count = self.counted[name]
+            if not count:
+                lines.append(f"{name:<10} {'-':>9} {'-':>9}")
+                continue
+            per_agent = "" if name == "active" else f"{value / agents:.2f}"
+            lines.append(f"{name:<10} {value / count:>9.1f} {per_agent:>9}")
+        return "\n".join(lines)
+
+    def close(self):
+        print(self.report())
+        if self.file:
+            if not self.writer:
+                self.file.write("]")
+            self.file.close()
+            self.file = None
@@ -0,0 +1,57 @@
+import math
+import random
+
+class Region:
+    """Axis-aligned box, edges included; leave a side out to extend the box to infinity."""
+
+    def __init__(self, left=-math.inf, top=-math.inf, right=math.inf, bottom=math.inf):
+        self.left = left
+        self.top = top
+        self.right = right
+        self.bottom = bottom
+
+    def contains(self, position):
+        return self.left <= position.x <= self.right and self.top <= position.y <= self.bottom
+
+
+class Source:
+    """Emits pooled agents into ``region``.
+
+    Arrivals are a Poisson process of ``rate`` agents per simulated second,
+    plus any scheduled arrival ``times``. ``init(agent)`` sets up each
+    emitted agent after its position and velocity are reset.
+    """
+
+    def __init__(self, region, rate=0, times=(), init=None):
+        self.region = region
+        self.rate = rate
+        self.times = sorted(times)
+        self.init = init
+        self.next = None
+        self.scheduled = 0
+        # arrivals that found the pool empty
+        self.dropped = 0
+
+    def arrivals(self, start, end):
+        """Number of arrivals in the simulated interval [start, end)."""
+        count = 0
+        if self.rate:
+            if self.next is None:
+                self.next = start + random.expovariate(self.rate)
+            while self.next < end:
+                count += 1
+                self.next += random.expovariate(self.rate)
+        while self.scheduled < len(self.times) and self.times[self.scheduled] < end:
+            count += 1
+            self.scheduled += 1
+        return count
+
+    def emit(self, agent):
+        region = self.region
+        agent.position.update(random.uniform(region.left, region.right), random.uniform(region.top, region.bottom))
+        agent.velocity.update(0, 0)
+        agent.goal.update(agent.position)
+        agent.target.update(agent.position)
+        agent.data.clear()
+        if self.init:
+            self.init(agent)
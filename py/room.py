@@ -1,8 +1,8 @@
-import pygame
 from pygame.math import Vector2
 from agent import Agent
 from wall import Wall
-from physics import update_agent
+from regions import Region
+from simulation import Scenario, main
 import utils
 import random
 
@@ -17,20 +17,6 @@ CONFIG = {
     "SIDESTEP": 15,
 }
 
-SCREEN_WIDTH = 600
-SCREEN_HEIGHT = 600
-TIMESTEP = 0.05
-
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-clock = pygame.time.Clock()
-
-agents = []
-walls = []
-positions = {}
-frame = 0
-pause = False
-
 walls_data = [
     (300, True, Vector2(300, 150)),
     (225, False, Vector2(450, 262.5)),
@@ -41,26 +27,24 @@ walls_data = [
     (75, False, Vector2(270, 412.5)),
 ]
 
-for length, vertical, pos in walls_data:
-    walls.append(Wall(length, vertical, pos))
+class Room(Scenario):
+    """Room evacuation"""
+    CONFIG = CONFIG
 
-for i in range(CONFIG["COUNT"]):
-    pos = utils.get_position(175, 425, 175, 275)
-    max_speed = random.uniform(1, CONFIG["MAXSPEED"])
-    agents.append(Agent(i, pos, CONFIG["RADIUS"], max_speed, CONFIG["MAXFORCE"],
-                        CONFIG["HORIZON"], CONFIG["K"], CONFIG["AVOID"], CONFIG["SIDESTEP"]))
+    def setup(self):
+        config = self.config
+        for length, vertical, pos in walls_data:
+            self.walls.append(Wall(length, vertical, pos))
+        self.sinks.append(Region(top=self.SCREEN_HEIGHT))
 
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                pause = not pause
+        for i in range(config["COUNT"]):
+            pos = utils.get_position(175, 425, 175, 275)
+            max_speed = random.uniform(1, config["MAXSPEED"])
+            self.agents.append(Agent(i, pos, config["RADIUS"], max_speed, config["MAXFORCE"],
+                                     config["HORIZON"], config["K"], config["AVOID"], config["SIDESTEP"]))
 
-    if not pause:
-        for agent in agents:
+    def update(self, dt):
+        for agent in self.active:
             if agent.position.y < 375:
                 if agent.position.x > 330:
                     agent.target.x = 270
@@ -69,27 +53,9 @@ while running:
                 else:
                     agent.target.x = 300
                 agent.target.y = 405
-            
+
             if agent.position.y >= 375:
                 agent.target.y = 900
 
-        for agent in agents:
-            update_agent(agent, agents, TIMESTEP)
-
-        for agent in agents:
-            for wall in walls:
-                wall.collision_resolve(agent)
-
-        frame += 1
-        positions[frame] = {agent.id: (agent.position.x, agent.position.y) for agent in agents}
-
-    screen.fill((30, 30, 30))
-    for wall in walls:
-        pygame.draw.rect(screen, (200, 200, 200), wall.rect)
-    for agent in agents:
-        pygame.draw.circle(screen, (0, 255, 0), (int(agent.position.x), int(agent.position.y)), int(agent.radius))
-
-    pygame.display.flip()
-    clock.tick(60)
-
-pygame.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main(Room)
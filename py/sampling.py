@@ -0,0 +1,123 @@
+"""
+Poisson-disc (Bridson) sampling restricted to a region, with an on-disk cache.
+
+Sampling only inside the region skips the work of covering the whole canvas
+and filtering afterwards. ``cached`` stores derived point sets under a hash
+of everything they depend on, so a scenario's startup is a file load after
+the first run.
+"""
+
+import hashlib
+import json
+import math
+import os
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+# bump when sampling or classification changes so stale caches are not reused
+VERSION = 1
+
+
+class Polygon:
+    def __init__(self, vertices):
+        self.vertices = np.asarray(vertices, dtype=float)
+
+    def bounds(self):
+        return self.vertices.min(axis=0), self.vertices.max(axis=0)
+
+    def contains(self, points):
+        # even-odd rule over every edge at once
+        x, y = points[:, 0:1], points[:, 1:2]
+        a = self.vertices
+        b = np.roll(a, -1, axis=0)
+        crosses = (a[:, 1] > y) != (b[:, 1] > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            at = a[:, 0] + (y - a[:, 1]) * (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1])
+        return (crosses & (x < at)).sum(axis=1) % 2 == 1
+
+    def key(self):
+        return ["polygon", self.vertices.tolist()]
+
+
+class Annulus:
+    def __init__(self, center, inner, outer):
+        self.center = np.asarray(center, dtype=float)
+        self.inner = inner
+        self.outer = outer
+
+    def bounds(self):
+        return self.center - self.outer, self.center + self.outer
+
+    def contains(self, points):
+        d = np.hypot(points[:, 0] - self.center[0], points[:, 1] - self.center[1])
+        return (self.inner < d) & (d < self.outer)
+
+    def key(self):
+        return ["annulus", self.center.tolist(), self.inner, self.outer]
+
+
+def bridson(region, radius, k=30, rng=None):
+    """Points inside ``region`` no closer than ``radius`` to each other."""
+    rng = rng or np.random.default_rng()
+    lo, hi = region.bounds()
+    cell = radius / math.sqrt(2)
+    shape = (int((hi[0] - lo[0]) / cell) + 1, int((hi[1] - lo[1]) / cell) + 1)
+    grid = np.full(shape, -1)
+    points = np.zeros((shape[0] * shape[1], 2))
+    count = 0
+
+    for _ in range(1000):
+        start = rng.uniform(lo, hi)
+        if region.contains(start[None])[0]:
+            break
+    else:
+        return points[:0]
+
+    def add(p):
+        nonlocal count
+        points[count] = p
+        grid[tuple(((p - lo) / cell).astype(int))] = count
+        count += 1
+        return count - 1
+
+    active = [add(start)]
+    r2 = radius * radius
+    while active:
+        a = rng.integers(len(active))
+        angle = rng.uniform(0, 2 * math.pi, k)
+        # uniform over the area of the annulus between radius and 2 * radius
+        distance = radius * np.sqrt(rng.uniform(1, 4, k))
+        candidates = points[active[a]] + np.stack((np.cos(angle), np.sin(angle)), axis=1) * distance[:, None]
+        inside = np.all((candidates >= lo) & (candidates <= hi), axis=1)
+        candidates = candidates[inside]
+        candidates = candidates[region.contains(candidates)]
+
+        for p in candidates:
+            gx, gy = ((p - lo) / cell).astype(int)
+            near = grid[max(gx - 2, 0):gx + 3, max(gy - 2, 0):gy + 3]
+            near = near[near >= 0]
+            if not near.size or (((points[near] - p) ** 2).sum(axis=1) >= r2).all():
+                active.append(add(p))
+                break
+        else:
+            active[a] = active[-1]
+            active.pop()
+    return points[:count].copy()
+
+
+def cached(key, compute, cache_dir=CACHE_DIR):
+    """The dict of arrays ``compute()`` returns, stored on disk under a hash of the JSON-able ``key``."""
+    digest = hashlib.sha1(json.dumps([VERSION, key], sort_keys=True).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"{digest}.npz")
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    arrays = compute()
+    os.makedirs(cache_dir, exist_ok=True)
+    # write then rename, so parallel runs never read a partial file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+    return arrays
@@ -0,0 +1,316 @@
+import importlib
+import random
+from collections import deque
+from contextlib import nullcontext
+import numpy as np
+import pygame
+from grid import SpatialGrid
+from concurrent.futures import ThreadPoolExecutor
+from physics import update_agent, update_agents_sync
+from crowd import CrowdStepper
+from kernels import CompiledStepper
+from domains import DomainStepper
+from walls import WallSet
+from adaptive import AdaptiveTimestep
+from display import Display, parse_args
+from trajectory import TrajectoryRecorder, write_text
+import profiling
+import checkpoint
+
+SCENARIOS = {
+    "room": "room:Room",
+    "museum": "museum:Museum",
+    "subway": "subway:Subway",
+    "walkway": "walkway:Walkway",
+    "airplane": "airplane:Airplane",
+    "performer": "performer:Performer",
+}
+
+def load_scenario(name):
+    module, cls = SCENARIOS[name].split(":")
+    return getattr(importlib.import_module(module), cls)
+
+def _blank_scenario(module, name):
+    cls = getattr(importlib.import_module(module), name)
+    return cls.__new__(cls)
+
+class Scenario:
+    CONFIG = {}
+    SCREEN_WIDTH = 600
+    SCREEN_HEIGHT = 600
+    TIMESTEP = 0.05
+    # rebuilt from the rest of the state on restore, so checkpoints leave them out
+    TRANSIENT = ("profiler", "pool", "stepper", "grid", "wallset")
+
+    def __init__(self, config=None, seed=None, timestep=None, ccd=False, adaptive=None, physics="serial", workers=None,
+                 profiler=None):
+        self.config = dict(self.CONFIG, **(config or {}))
+        # a profiling.Profiler times each phase of the step
+        self.profiler = profiler
+        # serial: update_agent in list order; sync: object Jacobi step; vector: NumPy Crowd;
+        # compiled: Numba kernels for the sync step; domains: the sync step split over processes
+        self.physics = physics
+        self.workers = workers
+        self.start_engine()
+        self.timestep = timestep or self.TIMESTEP
+        # an AdaptiveTimestep picks each step's dt in place of the fixed timestep
+        self.adaptive = adaptive
+        # sweep agents against walls so larger timesteps cannot tunnel
+        self.ccd = ccd
+        self.seed = seed
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+        self.agents = []
+        self.walls = []
+        # agents inside a sink leave the active set and are no longer stepped
+        self.sinks = []
+        # sources reuse inactive agents from the free pool instead of allocating; the pool is FIFO, so
+        # the agent drawn is the one that has been inactive longest
+        self.sources = []
+        self.free = deque()
+        self.grid = SpatialGrid()
+        self.frame = 0
+        self.time = 0.0
+        self.setup()
+        for slot, agent in enumerate(self.agents):
+            agent.slot = slot
+        pooled = set(map(id, self.free))
+        self.active = [agent for agent in self.agents if id(agent) not in pooled]
+        self.wallset = WallSet(self.walls)
+
+    def start_engine(self):
+        workers = self.workers
+        self.pool = ThreadPoolExecutor(workers) if workers and self.physics in ("sync", "vector") else None
+        self.stepper = {"vector": CrowdStepper, "compiled": CompiledStepper,
+                        "domains": lambda: DomainStepper(workers)}.get(self.physics, lambda: None)()
+
+    def __reduce_ex__(self, protocol):
+        # scenario scripts run as __main__, so save the class under the module it can be imported from
+        cls = type(self)
+        module = cls.__module__
+        if module == "__main__":
+            module = next(spec.split(":")[0] for spec in SCENARIOS.values() if spec.split(":")[1] == cls.__name__)
+        return _blank_scenario, (module, cls.__name__), self.__getstate__()
+
+    def __getstate__(self):
+        return {name: value for name, value in self.__dict__.items() if name not in self.TRANSIENT}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.profiler = None
+        self.grid = SpatialGrid()
+        self.wallset = WallSet(self.walls)
+        self.start_engine()
+
+    def setup(self):
+        pass
+
+    def preallocate(self, count, make):
+        """Add ``count`` inactive agents ``make(i)`` to the pool that sources draw from."""
+        for _ in range(count):
+            agent = make(len(self.agents))
+            self.agents.append(agent)
+            self.free.append(agent)
+
+    def spawn(self, dt):
+        """Activate pooled agents for each source's arrivals during the step just taken."""
+        for source in self.sources:
+            for _ in range(source.arrivals(self.time, self.time + dt)):
+                if not self.free:
+                    source.dropped += 1
+                    continue
+                agent = self.free.popleft()
+                source.emit(agent)
+                self.active.append(agent)
+
+    def update(self, dt):
+        """Scenario rules: targets and state machines, before the physics step."""
+        pass
+
+    def phase(self, name):
+        return self.profiler.phase(name) if self.profiler else nullcontext()
+
+    def counters(self):
+        """Work done by the last step, for the profiler; None where the engine does not count it."""
+        candidates = ttc = None
+        if self.physics in ("serial", "sync") or self.adaptive and self.adaptive.regions:
+            candidates = self.grid.candidates
+            # every candidate but the agent itself gets a time-to-collision test
+            ttc = self.grid.candidates - self.grid.queries
+        elif self.physics == "vector" and self.stepper.crowd is not None:
+            candidates = self.stepper.crowd.candidates
+            ttc = self.stepper.crowd.pairs
+        return {"active": len(self.active), "candidates": candidates, "ttc": ttc, "wall_tests": self.wallset.tests}
+
+    def positions(self):
+        return np.array([(agent.position.x, agent.position.y) for agent in self.active]).reshape(-1, 2)
+
+    def move(self, dt, substeps=None):
+        agents = self.active
+        prev = self.positions() if self.ccd else None
+
+        with self.phase("forces"):
+            if self.physics == "vector" and substeps is None:
+                self.stepper.step(agents, dt, self.pool)
+            elif self.physics in ("compiled", "domains") and substeps is None:
+                self.stepper.step(agents, dt)
+            elif self.physics == "sync" and substeps is None:
+                self.grid.rebuild(agents)
+                update_agents_sync(agents, self.grid, dt, self.pool)
+            elif substeps is None:
+                self.grid.rebuild(agents, dt)
+                for agent in agents:
+                    update_agent(agent, self.grid, dt)
+            else:
+                # per-region substeps interleave agents, which only the in-order update supports
+                self.grid.rebuild(agents, dt)
+                for r in range(substeps.max()):
+                    for agent, k in zip(agents, substeps.tolist()):
+                        if r < k:
+                            update_agent(agent, self.grid, dt / k)
+
+        self.collide(prev)
+
+    def collide(self, prev=None):
+        """Resolve active agents against the walls, sweeping from ``prev`` positions when given."""
+        with self.phase("walls"):
+            self.wallset.tests = 0
+            if prev is not None:
+                self.wallset.sweep(self.active, prev)
+            self.wallset.resolve(self.active)
+
+    def despawn(self, inside=None):
+        """Remove agents that reached a sink from the active set; returns them.
+
+        ``inside`` flags the active agents in a sink, when the caller has tested them already.
+        """
+        if not self.sinks:
+            return []
+        if inside is None:
+            inside = [any(sink.contains(agent.position) for sink in self.sinks) for agent in self.active]
+        active = []
+        left = []
+        for agent, leaving in zip(self.active, inside):
+            if leaving:
+                left.append(agent)
+            else:
+                active.append(agent)
+        self.active = active
+        return left
+
+    def next_step(self):
+        """(dt, substeps) for the coming step."""
+        if self.adaptive is None:
+            return self.timestep, None
+        return self.adaptive.choose(self)
+
+    def prestep(self, dt):
+        """Runs before the rules and physics; False when this frame went to something else and they are skipped."""
+        return True
+
+    def step(self, dt, substeps=None):
+        if not self.prestep(dt):
+            return
+        with self.phase("update"):
+            self.update(dt)
+        self.move(dt, substeps)
+        self.finish(dt)
+
+    def finish(self, dt, inside=None):
+        """Agent lifecycle and the clock, once agents have moved."""
+        with self.phase("lifecycle"):
+            left = self.despawn(inside)
+            self.spawn(dt)
+            # agents that left only rejoin the pool after spawning, so a recorded slot is dead for at least
+            # one frame before it changes owner and two walkers' tracks are never joined
+            self.free.extend(left)
+        self.frame += 1
+        self.time += dt
+
+    def done(self):
+        # closed scenarios with sinks are done once every agent has left through one
+        return bool(self.sinks) and not self.sources and not self.active
+
+    def state(self):
+        return {agent.id: (agent.position.x, agent.position.y) for agent in self.active}
+
+    def handle(self, event):
+        pass
+
+    def agent_color(self, agent):
+        return (0, 255, 0)
+
+    def draw(self, screen):
+        screen.fill((30, 30, 30))
+        for wall in self.walls:
+            pygame.draw.rect(screen, (200, 200, 200), wall.rect)
+        for agent in self.active:
+            pygame.draw.circle(screen, self.agent_color(agent), (int(agent.position.x), int(agent.position.y)), int(agent.radius))
+
+def run(scenario, display, frames=None, recorder=None, save=None, save_every=None):
+    pause = False
+    running = True
+    if recorder:
+        recorder.start(scenario.active, scenario.time, [agent.slot for agent in scenario.active])
+    while running:
+        for event in display.events():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                pause = not pause
+            else:
+                scenario.handle(event)
+
+        if not pause:
+            scenario.step(*scenario.next_step())
+            if recorder:
+                with scenario.phase("record"):
+                    recorder.record(scenario.active, time=scenario.time, slots=[agent.slot for agent in scenario.active])
+
+            if save and save_every and scenario.frame % save_every == 0:
+                checkpoint.save(scenario, save)
+            # a resumed checkpoint can already be past the limit
+            if frames is not None and scenario.frame >= frames or (display.headless and scenario.done()):
+                running = False
+
+        if not display.headless:
+            with scenario.phase("draw"):
+                scenario.draw(display.screen)
+                display.flip()
+
+        if scenario.profiler and not pause:
+            scenario.profiler.end_frame(scenario)
+
+    display.close()
+    if save:
+        checkpoint.save(scenario, save)
+    if scenario.profiler:
+        scenario.profiler.close()
+
+def main(scenario_cls):
+    args = parse_args(scenario_cls.__doc__)
+    display = Display(scenario_cls.SCREEN_WIDTH, scenario_cls.SCREEN_HEIGHT, args.headless)
+    adaptive = None
+    if args.adaptive:
+        adaptive = AdaptiveTimestep(dt_max=args.timestep or 0.2, regions=args.regions)
+    profiler = profiling.Profiler(args.profile or None) if args.profile is not None else profiling.from_env()
+    if args.resume:
+        # the checkpoint keeps its own engine and timestep settings; a seed forks it
+        scenario = checkpoint.load(args.resume, args.seed)
+        scenario.profiler = profiler
+    else:
+        scenario = scenario_cls(seed=args.seed, timestep=args.timestep, ccd=args.ccd, adaptive=adaptive,
+                                physics=args.physics, workers=args.workers, profiler=profiler)
+    recorder = None
+    if args.out:
+        path = None if args.out.endswith(".txt") else args.out
+        # adaptive runs are resampled to the fixed timestep so frames stay uniform
+        rate = scenario.TIMESTEP if scenario.adaptive else None
+        recorder = TrajectoryRecorder(len(scenario.agents), path, args.velocities, timestep=rate or scenario.timestep,
+                                      ids=[agent.id for agent in scenario.agents], rate=rate)
+    run(scenario, display, args.frames, recorder, args.checkpoint, args.checkpoint_every)
+    if recorder:
+        recorder.close()
+        if path is None:
+            write_text(recorder.trajectory(), args.out)
@@ -0,0 +1,116 @@
+import heapq
+import math
+from pygame.math import Vector2
+
+LEAF_SIZE = 16
+
+class SlotAllocator:
+    """Fixed points that agents take and give back, e.g. viewing positions.
+
+    ``acquire`` takes the free point minimising ``wa * |p - a| + wb * |p - b|``,
+    found by best-first branch and bound over a k-d tree whose nodes count
+    their free points, so taken subtrees are skipped and neither a sort of
+    the whole list nor a list.remove is needed.
+    """
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        self.points = [(float(x), float(y)) for x, y in points]
+        self.leaf_size = leaf_size
+        self.taken = [False] * len(self.points)
+        self.leaf_of = [0] * len(self.points)
+        self.lo = []
+        self.hi = []
+        self.parent = []
+        self.children = []
+        self.members = []
+        self.free = []
+        if self.points:
+            self.build(list(range(len(self.points))), -1)
+
+    def build(self, index, parent):
+        node = len(self.lo)
+        xs = [self.points[i][0] for i in index]
+        ys = [self.points[i][1] for i in index]
+        self.lo.append((min(xs), min(ys)))
+        self.hi.append((max(xs), max(ys)))
+        self.parent.append(parent)
+        self.free.append(len(index))
+        self.children.append(None)
+        self.members.append(None)
+
+        if len(index) <= self.leaf_size:
+            self.members[node] = index
+            for i in index:
+                self.leaf_of[i] = node
+            return node
+
+        axis = 0 if max(xs) - min(xs) >= max(ys) - min(ys) else 1
+        index = sorted(index, key=lambda i: self.points[i][axis])
+        half = len(index) // 2
+        self.children[node] = (self.build(index[:half], node), self.build(index[half:], node))
+        return node
+
+    def __len__(self):
+        """Number of free points."""
+        return self.free[0] if self.free else 0
+
+    def point(self, slot):
+        return Vector2(self.points[slot])
+
+    def distance(self, node, x, y):
+        # from (x, y) to the node's bounding box
+        lo, hi = self.lo[node], self.hi[node]
+        dx = max(lo[0] - x, 0.0, x - hi[0])
+        dy = max(lo[1] - y, 0.0, y - hi[1])
+        return math.sqrt(dx * dx + dy * dy)
+
+    def best(self, a, wa=1.0, b=None, wb=0.0):
+        """Free slot minimising wa * |p - a| + wb * |p - b|, or None when every slot is taken."""
+        if not len(self):
+            return None
+        ax, ay = a
+        bx, by = a if b is None else b
+        best, best_score = None, math.inf
+        heap = [(0.0, 0)]
+        while heap:
+            bound, node = heapq.heappop(heap)
+            if bound >= best_score:
+                break
+            members = self.members[node]
+            if members is None:
+                for child in self.children[node]:
+                    if self.free[child]:
+                        heapq.heappush(heap, (wa * self.distance(child, ax, ay) + wb * self.distance(child, bx, by), child))
+                continue
+            for i in members:
+                if self.taken[i]:
+                    continue
+                px, py = self.points[i]
+                score = wa * math.sqrt((px - ax) ** 2 + (py - ay) ** 2) + wb * math.sqrt((px - bx) ** 2 + (py - by) ** 2)
+                if score < best_score:
+                    best, best_score = i, score
+        return best
+
+    def acquire(self, a, wa=1.0, b=None, wb=0.0):
+        slot = self.best(a, wa, b, wb)
+        if slot is not None:
+            self.take(slot)
+        return slot
+
+    def take(self, slot):
+        if self.taken[slot]:
+            return
+        self.taken[slot] = True
+        node = self.leaf_of[slot]
+        while node != -1:
+            self.free[node] -= 1
+            node = self.parent[node]
+
+    def release(self, slot):
+        if not self.taken[slot]:
+            return
+        self.taken[slot] = False
+        node = self.leaf_of[slot]
+        while node != -1:
+            self.free[node] += 1
+            node = self.parent[node]
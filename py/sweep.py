@@ -0,0 +1,163 @@
+"""
+Parameter sweeps over a scenario's CONFIG dict on a process pool.
+
+    python sweep.py room --grid HORIZON=5,10,15 K=2,3 --seeds 10 --frames 3000
+    python sweep.py museum --random AVOID=5:25 SIDESTEP=5:25 --samples 100 --frames 2000
+    python sweep.py museum --warm warm.ckpt --grid DWELL=1,3,5 --seeds 10 --frames 4000
+
+Each finished run is appended to the results CSV straight away; rerunning
+the same command skips runs that are already in the file. With --warm every
+run forks a checkpoint instead of starting from setup; its parameters are
+applied to CONFIG, so only keys the scenario reads while stepping take
+effect, and the frame limit counts the warm-up frames too.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from crowd import overlaps
+from simulation import SCENARIOS, load_scenario
+import checkpoint
+
+METRICS = ["frames", "evac_time", "collisions", "mean_speed", "seconds", "error"]
+
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def grid_runs(specs):
+    keys = [spec.split("=", 1)[0] for spec in specs]
+    values = [[parse_value(v) for v in spec.split("=", 1)[1].split(",")] for spec in specs]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def random_runs(specs, samples, seed, config=None):
+    """Uniform draws for each KEY=LO:HI; keys whose CONFIG default is an int get ints, endpoints included.
+
+    Repeated draws are dropped, so narrow int ranges can give fewer than ``samples`` runs.
+    """
+    rng = random.Random(seed)
+    config = config or {}
+    ranges = {}
+    for spec in specs:
+        key, bounds = spec.split("=", 1)
+        lo, hi = bounds.split(":")
+        ranges[key] = (float(lo), float(hi))
+
+    def draw(key, lo, hi):
+        default = config.get(key)
+        if isinstance(default, int) and not isinstance(default, bool):
+            return rng.randint(math.ceil(lo), math.floor(hi))
+        value = rng.uniform(lo, hi)
+        return value if default is None else type(default)(value)
+    draws = {}
+    for _ in range(samples):
+        params = {key: draw(key, lo, hi) for key, (lo, hi) in ranges.items()}
+        draws.setdefault(json.dumps(params, sort_keys=True), params)
+    return list(draws.values())
+
+
+def run_key(scenario, params, seed, warm=None):
+    return json.dumps([scenario, params, seed] + ([warm] if warm else []), sort_keys=True)
+
+
+def count_collisions(scenario):
+    pos = np.array([(a.position.x, a.position.y) for a in scenario.active]).reshape(-1, 2)
+    radius = np.array([a.radius for a in scenario.active])
+    return int(overlaps(pos, radius)[0])
+
+
+def run_one(name, params, seed, frames, warm=None):
+    start = time.perf_counter()
+    if warm:
+        scenario = checkpoint.load(warm, seed)
+        scenario.config.update(params)
+    else:
+        scenario = load_scenario(name)(params, seed=seed)
+    collisions = 0
+    speed = 0.0
+    samples = 0
+    while scenario.frame < frames and not scenario.done():
+        scenario.step(scenario.timestep)
+        collisions += count_collisions(scenario)
+        speed += sum(agent.velocity.length() for agent in scenario.active)
+        samples += len(scenario.active)
+
+    return {
+        "frames": scenario.frame,
+        "evac_time": scenario.frame * scenario.timestep if scenario.done() else "",
+        "collisions": collisions,
+        "mean_speed": speed / samples if samples else 0.0,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def completed(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as f:
+        # failed runs are recorded but not done, so a rerun tries them again
+        return {row["run"] for row in csv.DictReader(f) if not row.get("error")}
+
+
+def sweep(name, runs, seeds, frames, out, workers=None, warm=None):
+    keys = sorted({key for params in runs for key in params})
+    done = completed(out)
+    # repeated parameter sets would run twice and write rows with the same run key
+    unique = {run_key(name, params, seed, warm): (params, seed) for params in runs for seed in seeds}
+    todo = [run for key, run in unique.items() if key not in done]
+    print(f"{len(todo)} runs to do, {len(unique) - len(todo)} already in {out}")
+
+    new_file = not os.path.exists(out) or os.path.getsize(out) == 0
+    with open(out, "a", newline="") as f, ProcessPoolExecutor(workers) as pool:
+        writer = csv.DictWriter(f, ["run", "scenario", "seed"] + keys + METRICS)
+        if new_file:
+            writer.writeheader()
+
+        futures = {pool.submit(run_one, name, params, seed, frames, warm): (params, seed) for params, seed in todo}
+        for i, future in enumerate(as_completed(futures), 1):
+            params, seed = futures[future]
+            row = {"run": run_key(name, params, seed, warm), "scenario": name, "seed": seed}
+            row.update(params)
+            try:
+                row.update(future.result())
+            except Exception as e:
+                row["error"] = f"{type(e).__name__}: {e}"
+                print(f"[{i}/{len(todo)}] seed={seed} {params} failed: {row['error']}")
+            else:
+                print(f"[{i}/{len(todo)}] seed={seed} {params} -> {row['frames']} frames")
+            writer.writerow(row)
+            f.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep scenario CONFIG values over a process pool")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--grid", nargs="*", default=[], metavar="KEY=V1,V2", help="values to take the product over")
+    parser.add_argument("--random", nargs="*", default=[], metavar="KEY=LO:HI", help="uniform ranges to sample")
+    parser.add_argument("--samples", type=int, default=20, help="number of random draws")
+    parser.add_argument("--sample-seed", type=int, default=0, help="seed for the random draws")
+    parser.add_argument("--seeds", type=int, default=1, help="scenario seeds per parameter set")
+    parser.add_argument("--frames", type=int, default=2000, help="frame limit per run")
+    parser.add_argument("--workers", type=int, default=None, help="pool size, all cores by default")
+    parser.add_argument("--warm", default=None, metavar="PATH", help="fork every run from this checkpoint")
+    parser.add_argument("--out", default="sweep.csv")
+    args = parser.parse_args()
+
+    runs = grid_runs(args.grid) if args.grid else [{}]
+    if args.random:
+        draws = random_runs(args.random, args.samples, args.sample_seed, load_scenario(args.scenario).CONFIG)
+        runs = [dict(base, **draw) for base in runs for draw in draws]
+
+    sweep(args.scenario, runs, list(range(args.seeds)), args.frames, args.out, args.workers, args.warm)
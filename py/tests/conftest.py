@@ -0,0 +1,48 @@
+import copy
+import os
+import sys
+import numpy as np
+import pytest
+from pygame.math import Vector2
+
+# the simulation modules are flat scripts that import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import Agent  # noqa: E402
+
+TIMESTEP = 0.05
+
+
+@pytest.fixture
+def crowd():
+    """300 agents with random state and parameters in a 300 x 300 box."""
+    rng = np.random.default_rng(0)
+    agents = []
+    for i in range(300):
+        agent = Agent(i, Vector2(*rng.uniform(0, 300, 2)), rng.uniform(2, 5), rng.uniform(5, 30),
+                      rng.uniform(20, 60), 7.5, 5, 15, 15)
+        agent.velocity = Vector2(*rng.uniform(-10, 10, 2))
+        agent.target = Vector2(*rng.uniform(0, 300, 2))
+        agents.append(agent)
+    return agents
+
+
+@pytest.fixture
+def update_agent_step(crowd):
+    """Positions and velocities after physics.update_agent moves each agent of ``crowd`` on its own.
+
+    Every agent sees the others where they were before the step, which is
+    what the synchronous engines compute for all of them at once.
+    """
+    from physics import update_agent
+
+    position = []
+    velocity = []
+    for agent in crowd:
+        moved = copy.copy(agent)
+        moved.position = Vector2(agent.position)
+        moved.velocity = Vector2(agent.velocity)
+        update_agent(moved, crowd, TIMESTEP)
+        position.append((moved.position.x, moved.position.y))
+        velocity.append((moved.velocity.x, moved.velocity.y))
+    return np.array(position), np.array(velocity)
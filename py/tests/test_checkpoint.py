@@ -0,0 +1,19 @@
+import pytest
+import checkpoint
+from simulation import load_scenario
+
+
+@pytest.mark.parametrize("name", ["museum", "performer"])
+def test_restored_run_matches_uninterrupted(name, warmup=100, frames=100):
+    scenario = load_scenario(name)(seed=0)
+    for _ in range(warmup):
+        scenario.step(scenario.timestep)
+    data = checkpoint.dumps(scenario)
+    for _ in range(frames):
+        scenario.step(scenario.timestep)
+
+    restored = checkpoint.loads(data)
+    for _ in range(frames):
+        restored.step(restored.timestep)
+    assert restored.frame == scenario.frame
+    assert restored.state() == scenario.state()
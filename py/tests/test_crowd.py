@@ -0,0 +1,44 @@
+import math
+import numpy as np
+import pytest
+import physics
+from crowd import Crowd, overlaps
+from conftest import TIMESTEP
+
+# pairs are summed in cell order rather than list order
+ATOL = 1e-9
+
+
+def test_step_matches_update_agent(crowd, update_agent_step):
+    state = Crowd.from_agents(crowd)
+    state.step(TIMESTEP)
+    position, velocity = update_agent_step
+    np.testing.assert_allclose(state.position, position, rtol=0, atol=ATOL)
+    np.testing.assert_allclose(state.velocity, velocity, rtol=0, atol=ATOL)
+
+
+def test_min_time_to_collision(crowd):
+    state = Crowd.from_agents(crowd)
+    got = state.min_time_to_collision()
+    for agent, soonest in zip(crowd, got):
+        times = [physics.time_to_collision(agent, other) for other in crowd if other is not agent]
+        ahead = [t for t in times if 0 < t < math.inf]
+        expected = min(ahead, default=math.inf)
+        # pairs beyond the reach bound are skipped, and their time to collision is past the horizon
+        if expected <= agent.horizon:
+            assert soonest == pytest.approx(expected, rel=1e-12)
+        else:
+            assert soonest > agent.horizon
+
+
+def test_overlaps_matches_all_pairs(crowd):
+    state = Crowd.from_agents(crowd)
+    group = np.arange(len(crowd)) % 3
+    diff = state.position[:, None] - state.position[None]
+    reach = state.radius[:, None] + state.radius[None]
+    hit = np.triu((diff ** 2).sum(axis=2) < reach ** 2, k=1)
+    assert hit.any()
+    assert overlaps(state.position, state.radius)[0] == hit.sum()
+    same = group[:, None] == group[None]
+    expected = [(hit & same & (group[:, None] == g)).sum() for g in range(3)]
+    assert overlaps(state.position, state.radius, group, 3).tolist() == expected
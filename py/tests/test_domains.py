@@ -0,0 +1,33 @@
+import numpy as np
+from crowd import Crowd
+from domains import DomainCrowd
+from conftest import TIMESTEP
+
+# tiles see their agents and halo in a different order than the whole crowd
+ATOL = 1e-9
+
+
+def test_step_matches_update_agent(crowd, update_agent_step):
+    state = DomainCrowd(len(crowd), tiles=4, workers=2)
+    try:
+        state.load(crowd)
+        state.step(TIMESTEP)
+        position, velocity = update_agent_step
+        np.testing.assert_allclose(state.position, position, rtol=0, atol=ATOL)
+        np.testing.assert_allclose(state.velocity, velocity, rtol=0, atol=ATOL)
+    finally:
+        state.close()
+
+
+def test_steps_match_crowd(crowd):
+    reference = Crowd.from_agents(crowd)
+    state = DomainCrowd(len(crowd), tiles=4, workers=2)
+    try:
+        state.load(crowd)
+        for _ in range(10):
+            reference.step(TIMESTEP)
+            state.step(TIMESTEP)
+            np.testing.assert_allclose(state.position, reference.position, rtol=0, atol=ATOL)
+            np.testing.assert_allclose(state.velocity, reference.velocity, rtol=0, atol=ATOL)
+    finally:
+        state.close()
@@ -0,0 +1,36 @@
+import pytest
+from ensemble import Ensemble
+from simulation import load_scenario
+
+# subway spends its first 61 frames on the boarding animation, outside the batch
+FIRST = {"room": 1, "walkway": 1, "subway": 62}
+
+
+def largest_difference(name, seeds, frames, physics):
+    """Largest position difference between ensemble replicas and separate runs of the same seeds."""
+    cls = load_scenario(name)
+    ensemble = Ensemble(cls, seeds, frames=frames, physics=physics)
+    ensemble.run()
+    error = 0.0
+    for seed, replica in zip(seeds, ensemble.replicas):
+        alone = cls(seed=seed, physics=physics)
+        while alone.frame < frames and not alone.done():
+            alone.step(alone.timestep)
+        assert alone.frame == replica.frame
+        expected, got = alone.state(), replica.state()
+        assert expected.keys() == got.keys()
+        for key, (x, y) in expected.items():
+            error = max(error, abs(x - got[key][0]), abs(y - got[key][1]))
+    return error
+
+
+@pytest.mark.parametrize("physics", ["vector", "compiled"])
+@pytest.mark.parametrize("name", sorted(FIRST))
+def test_replicas_match_separate_runs(name, physics):
+    # replicas sum forces in another order, which chaotic crowds amplify over many frames
+    assert largest_difference(name, [0, 1, 2], FIRST[name], physics) < 1e-9
+
+
+@pytest.mark.parametrize("name", sorted(FIRST))
+def test_single_replica_is_exact(name):
+    assert largest_difference(name, [1], FIRST[name] + 59, "vector") == 0.0
@@ -0,0 +1,48 @@
+import copy
+import numpy as np
+from pygame.math import Vector2
+from agent import Agent
+from conftest import TIMESTEP
+from grid import SpatialGrid
+from physics import update_agent
+
+# the grid yields neighbors in cell order rather than list order
+ATOL = 1e-9
+
+
+def state(agents):
+    return np.array([(a.position.x, a.position.y, a.velocity.x, a.velocity.y) for a in agents])
+
+
+def in_order(agents, grid, steps):
+    """Final state of ``steps`` in-order updates against ``grid`` and against the full list."""
+    brute = [copy.copy(agent) for agent in agents]
+    for agent in brute:
+        agent.position = Vector2(agent.position)
+        agent.velocity = Vector2(agent.velocity)
+    for _ in range(steps):
+        grid.rebuild(agents, TIMESTEP)
+        for agent in agents:
+            update_agent(agent, grid, TIMESTEP)
+        for agent in brute:
+            update_agent(agent, brute, TIMESTEP)
+    return state(agents), state(brute)
+
+
+def test_in_order_update_matches_brute_force(crowd):
+    got, expected = in_order(crowd, SpatialGrid(), 5)
+    np.testing.assert_allclose(got, expected, rtol=0, atol=ATOL)
+
+
+def test_neighbor_moved_earlier_in_the_step():
+    # the runner starts beyond the walker's reach without the slack, in a cell only the slack brings
+    # into the walker's query, then moves first and comes within the walker's horizon
+    walker = Agent(1, Vector2(0, 0), 2, 1e-3, 50, 1, 5, 15, 15)
+    walker.target = Vector2(0, 0)
+    runner = Agent(0, Vector2(0, 0), 2, 30, 50, 1, 5, 15, 15)
+    runner.velocity = Vector2(-30, 0)
+    runner.target = Vector2(-1000, 0)
+    runner.position.x = walker.horizon * (walker.max_speed + runner.max_speed) + walker.radius + runner.radius + 1.2
+    got, expected = in_order([runner, walker], SpatialGrid(cell_size=1), 1)
+    assert expected[1, 2] != 0
+    np.testing.assert_allclose(got, expected, rtol=0, atol=ATOL)
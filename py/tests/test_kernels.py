@@ -0,0 +1,42 @@
+import math
+import numpy as np
+import pytest
+import kernels
+import physics
+from crowd import Crowd
+from conftest import TIMESTEP
+
+# the kernels sum the same terms as physics.py in a different order
+ATOL = 1e-9
+
+
+def test_time_to_collision_matches_physics(crowd):
+    for agent in crowd[:20]:
+        for neighbor in crowd:
+            if neighbor is agent:
+                continue
+            expected = physics.time_to_collision(agent, neighbor)
+            got = kernels.time_to_collision(agent.position.x, agent.position.y, agent.velocity.x, agent.velocity.y,
+                                            agent.radius, neighbor.position.x, neighbor.position.y,
+                                            neighbor.velocity.x, neighbor.velocity.y, neighbor.radius)
+            if math.isinf(expected):
+                assert math.isinf(got)
+            else:
+                assert got == pytest.approx(expected, rel=1e-12, abs=1e-12)
+
+
+@pytest.mark.skipif(not kernels.AVAILABLE, reason="numba is not installed")
+def test_step_matches_update_agent(crowd, update_agent_step):
+    state = Crowd.from_agents(crowd)
+    kernels.step_crowd(state, TIMESTEP)
+    position, velocity = update_agent_step
+    np.testing.assert_allclose(state.position, position, rtol=0, atol=ATOL)
+    np.testing.assert_allclose(state.velocity, velocity, rtol=0, atol=ATOL)
+
+
+def test_stepper_matches_update_agent(crowd, update_agent_step):
+    # without numba this is the update_agents_sync fallback
+    kernels.CompiledStepper().step(crowd, TIMESTEP)
+    position, velocity = update_agent_step
+    np.testing.assert_allclose([(a.position.x, a.position.y) for a in crowd], position, rtol=0, atol=ATOL)
+    np.testing.assert_allclose([(a.velocity.x, a.velocity.y) for a in crowd], velocity, rtol=0, atol=ATOL)
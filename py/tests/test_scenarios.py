@@ -0,0 +1,11 @@
+import pytest
+from simulation import SCENARIOS, load_scenario
+
+
+@pytest.mark.parametrize("name", sorted(SCENARIOS))
+def test_agent_ids_are_unique(name):
+    # state(), checkpoints and recorded ids are keyed by agent.id
+    scenario = load_scenario(name)(seed=0)
+    ids = [agent.id for agent in scenario.agents]
+    assert len(set(ids)) == len(ids)
+    assert len(scenario.state()) == len(scenario.active)
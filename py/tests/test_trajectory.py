@@ -0,0 +1,16 @@
+import pytest
+from pygame.math import Vector2
+from agent import Agent
+from trajectory import TrajectoryRecorder
+
+
+def test_resampling_counts_from_the_start_time():
+    # a run resumed from a checkpoint starts recording at its own clock, not at zero
+    agent = Agent(0, Vector2(0, 0), 1, 10, 10, 5, 1, 1, 1)
+    recorder = TrajectoryRecorder(1, rate=0.05)
+    recorder.start([agent], time=10.0)
+    agent.position = Vector2(3, 0)
+    recorder.record([agent], time=10.15)
+    trajectory = recorder.close().trajectory()
+    assert len(trajectory) == 3
+    assert trajectory.track(0)[:, 0] == pytest.approx([1, 2, 3])
@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import numpy as np
+
+CHUNK_FRAMES = 1024
+
+class TrajectoryRecorder:
+    """Records agent positions into fixed-size float32 chunks.
+
+    Slot ``i`` is ``agents[i]`` at record time, or the slot given for it in
+    ``slots``. Slots without an agent are marked dead and keep their last
+    recorded position. With a ``path`` each full
+    chunk is written to ``path/positions_NNNNN.npy`` (plus velocities and
+    alive mask) and dropped from memory; without one chunks are kept in RAM.
+
+    With a ``rate`` the recorder writes one frame every ``rate`` simulated
+    seconds, interpolating linearly between the steps around it, so runs
+    with a variable timestep still produce uniform frames.
+    """
+
+    def __init__(self, count, path=None, velocities=False, chunk_frames=CHUNK_FRAMES, timestep=None, ids=None,
+                 rate=None):
+        self.count = count
+        self.rate = rate
+        self.last = None
+        # simulated time resampled frames are counted from; a resumed run starts past zero
+        self.origin = 0.0
+        self.path = path
+        self.velocities = velocities
+        self.chunk_frames = chunk_frames
+        self.frames = 0
+        self.chunks = 0
+        self.kept = []
+        self.position = np.zeros((chunk_frames, count, 2), dtype=np.float32)
+        self.velocity = np.zeros((chunk_frames, count, 2), dtype=np.float32) if velocities else None
+        self.alive = np.zeros((chunk_frames, count), dtype=bool)
+        self.held = np.zeros((count, 2))
+        self.meta = {"count": count, "chunk_frames": chunk_frames, "velocities": velocities,
+                     "timestep": timestep, "ids": ids}
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def sample(self, agents, alive=None, slots=None):
+        rows = slice(0, len(agents)) if slots is None else np.asarray(slots, dtype=int)
+        position = self.held.copy()
+        if len(agents):
+            position[rows] = [(agent.position.x, agent.position.y) for agent in agents]
+        self.held = position
+        velocity = None
+        if self.velocities:
+            velocity = np.zeros((self.count, 2))
+            if len(agents):
+                velocity[rows] = [(agent.velocity.x, agent.velocity.y) for agent in agents]
+        mask = np.zeros(self.count, dtype=bool)
+        mask[rows] = True if alive is None else alive
+        return position, velocity, mask
+
+    def start(self, agents, time=0.0, slots=None):
+        """Remember the initial state that resampled frames interpolate from."""
+        if self.rate:
+            self.origin = time
+            self.last = (time,) + self.sample(agents, slots=slots)
+
+    def record(self, agents, alive=None, time=None, slots=None):
+        current = self.sample(agents, alive, slots)
+        if not self.rate or time is None:
+            self.write(*current)
+            return
+
+        if self.last is None:
+            self.last = (time,) + current
+        last_time, last_position, last_velocity, _ = self.last
+        position, velocity, mask = current
+        while time >= self.origin + (self.frames + 1) * self.rate - 1e-9:
+            at = self.origin + (self.frames + 1) * self.rate
+            w = (at - last_time) / (time - last_time) if time > last_time else 1.0
+            self.write(last_position + w * (position - last_position),
+                       None if velocity is None else last_velocity + w * (velocity - last_velocity),
+                       mask)
+        self.last = (time,) + current
+
+    def write(self, position, velocity, alive):
+        row = self.frames % self.chunk_frames
+        self.position[row] = position
+        if self.velocities:
+            self.velocity[row] = velocity
+        self.alive[row] = alive
+        self.frames += 1
+        if self.frames % self.chunk_frames == 0:
+            self.flush(self.chunk_frames)
+
+    def flush(self, rows):
+        arrays = {"positions": self.position, "alive": self.alive}
+        if self.velocities:
+            arrays["velocities"] = self.velocity
+        if self.path:
+            for name, array in arrays.items():
+                np.save(os.path.join(self.path, f"{name}_{self.chunks:05d}.npy"), array[:rows])
+        else:
+            self.kept.append({name: array[:rows].copy() for name, array in arrays.items()})
+        self.chunks += 1
+
+    def close(self):
+        rows = self.frames % self.chunk_frames
+        if rows:
+            self.flush(rows)
+        if self.path:
+            with open(os.path.join(self.path, "meta.json"), "w") as f:
+                json.dump(dict(self.meta, frames=self.frames, chunks=self.chunks), f)
+        return self
+
+    def trajectory(self):
+        if self.path:
+            return Trajectory(self.path)
+        return Trajectory.from_chunks(self.kept, dict(self.meta, frames=self.frames, chunks=self.chunks))
+
+
+class Trajectory:
+    """Read side of a recording; chunks are memory-mapped, not loaded."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        chunks = []
+        for i in range(meta["chunks"]):
+            names = ["positions", "alive"] + (["velocities"] if meta["velocities"] else [])
+            chunks.append({name: np.load(os.path.join(path, f"{name}_{i:05d}.npy"), mmap_mode="r") for name in names})
+        self.setup(chunks, meta)
+
+    @classmethod
+    def from_chunks(cls, chunks, meta):
+        trajectory = cls.__new__(cls)
+        trajectory.setup(chunks, meta)
+        return trajectory
+
+    def setup(self, chunks, meta):
+        self.chunks = chunks
+        self.meta = meta
+        self.frames = meta["frames"]
+        self.count = meta["count"]
+        self.chunk_frames = meta["chunk_frames"]
+
+    def __len__(self):
+        return self.frames
+
+    def locate(self, k):
+        if not 0 <= k < self.frames:
+            raise IndexError(f"frame {k} out of range for {self.frames} frames")
+        return self.chunks[k // self.chunk_frames], k % self.chunk_frames
+
+    def frame(self, k, channel="positions"):
+        chunk, row = self.locate(k)
+        return chunk[channel][row]
+
+    def track(self, agent, channel="positions"):
+        if len(self.chunks) == 1:
+            return self.chunks[0][channel][:, agent]
+        return np.concatenate([chunk[channel][:, agent] for chunk in self.chunks])
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk["positions"]
+
+
+def write_text(trajectory, path):
+    # same layout as the browser download: one line of x,y pairs per frame
+    with open(path, "w") as f:
+        for positions in trajectory:
+            f.write(",".join(f"{x:.4f},{y:.4f}" for x, y in positions.tolist()) + "\n")
+
+
+def iter_text(path, chunk_frames=CHUNK_FRAMES):
+    """Yield (frames, agents, 2) float32 blocks from a browser trajectory file."""
+    count = None
+    block = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            values = np.array(line.split(","), dtype=np.float32)
+            if count is None:
+                count = len(values) // 2
+            if len(values) != 2 * count:
+                raise ValueError(f"{path}:{number}: expected {2 * count} values, got {len(values)}")
+            block.append(values)
+            if len(block) == chunk_frames:
+                yield np.stack(block).reshape(-1, count, 2)
+                block = []
+    if block:
+        yield np.stack(block).reshape(-1, count, 2)
+
+
+def convert_text(src, dst, timestep=None):
+    """Convert a browser trajectory file into a single memory-mappable chunk."""
+    frames = 0
+    count = 0
+    with open(src) as f:
+        for line in f:
+            if line.strip():
+                if not frames:
+                    count = (line.count(",") + 1) // 2
+                frames += 1
+
+    os.makedirs(dst, exist_ok=True)
+    positions = np.lib.format.open_memmap(os.path.join(dst, "positions_00000.npy"), mode="w+",
+                                          dtype=np.float32, shape=(frames, count, 2))
+    start = 0
+    for block in iter_text(src):
+        positions[start:start + len(block)] = block
+        start += len(block)
+    positions.flush()
+    np.save(os.path.join(dst, "alive_00000.npy"), np.ones((frames, count), dtype=bool))
+
+    meta = {"count": count, "chunk_frames": max(frames, 1), "velocities": False, "timestep": timestep,
+            "ids": None, "frames": frames, "chunks": 1 if frames else 0}
+    with open(os.path.join(dst, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return Trajectory(dst)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a browser trajectory text file to the binary format")
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--timestep", type=float, default=None)
+    args = parser.parse_args()
+    trajectory = convert_text(args.src, args.dst, args.timestep)
+    print(f"{len(trajectory)} frames x {trajectory.count} agents -> {args.dst}")
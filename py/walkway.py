@@ -1,8 +1,8 @@
-import pygame
 from pygame.math import Vector2
 from agent import Agent
 from wall import Wall
-from physics import update_agent
+from regions import Region, Source
+from simulation import Scenario, main
 import utils
 import random
 
@@ -15,22 +15,12 @@ CONFIG = {
     "K": 3,
     "AVOID": 15,
     "SIDESTEP": 15,
+    # agents per second arriving at the entry area; 0 keeps the walkway closed
+    "RATE": 0,
+    "POOL": 150,
 }
 
-SCREEN_WIDTH = 600
-SCREEN_HEIGHT = 600
 LENGTH = 600
-TIMESTEP = 0.05
-
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-clock = pygame.time.Clock()
-
-agents = []
-walls = []
-positions = {}
-frame = 0
-pause = False
 
 walls_data = [
     (180, True, Vector2(300, 345)),
@@ -39,30 +29,39 @@ walls_data = [
     (180, True, Vector2(300, 255)),
 ]
 
-for length, vertical, pos in walls_data:
-    walls.append(Wall(length, vertical, pos))
+class Walkway(Scenario):
+    """Moving walkway"""
+    CONFIG = CONFIG
+
+    def setup(self):
+        config = self.config
+        for length, vertical, pos in walls_data:
+            self.walls.append(Wall(length, vertical, pos))
+        self.sinks.append(Region(left=self.SCREEN_WIDTH))
 
-for i in range(CONFIG["COUNT"]):
-    pos = utils.get_position(150, 210, 150, 450)
-    max_speed = random.uniform(15, CONFIG["MAXSPEED"])
-    agents.append(Agent(i, pos, CONFIG["RADIUS"], max_speed, CONFIG["MAXFORCE"],
-                        CONFIG["HORIZON"], CONFIG["K"], CONFIG["AVOID"], CONFIG["SIDESTEP"]))
+        for i in range(config["COUNT"]):
+            self.agents.append(self.make_agent(i, utils.get_position(150, 210, 150, 450)))
 
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                pause = not pause
+        if config["RATE"]:
+            self.preallocate(config["POOL"], self.make_agent)
+            self.sources.append(Source(Region(150, 150, 210, 450), config["RATE"], init=self.enter))
 
-    if not pause:
-        for agent in agents:
-            if agent.position.y > LENGTH - CONFIG["RADIUS"]:
-                agent.position.y = LENGTH - CONFIG["RADIUS"]
-            elif agent.position.y < CONFIG["RADIUS"]:
-                agent.position.y = CONFIG["RADIUS"]
+    def make_agent(self, i, pos=None):
+        config = self.config
+        max_speed = random.uniform(15, config["MAXSPEED"])
+        return Agent(i, pos or Vector2(), config["RADIUS"], max_speed, config["MAXFORCE"],
+                     config["HORIZON"], config["K"], config["AVOID"], config["SIDESTEP"])
+
+    def enter(self, agent):
+        agent.max_speed = random.uniform(15, self.config["MAXSPEED"])
+
+    def update(self, dt):
+        config = self.config
+        for agent in self.active:
+            if agent.position.y > LENGTH - config["RADIUS"]:
+                agent.position.y = LENGTH - config["RADIUS"]
+            elif agent.position.y < config["RADIUS"]:
+                agent.position.y = config["RADIUS"]
 
             if agent.position.y > 300:
                 agent.target.y = 337.5
@@ -72,36 +71,18 @@ while running:
 
             if 210 <= agent.position.x <= 390:
                 if 300 < agent.position.y < 345:
-                    agent.max_speed = CONFIG["MAXSPEED"] * 1.5
+                    agent.max_speed = config["MAXSPEED"] * 1.5
                 elif 255 < agent.position.y < 300:
-                    agent.max_speed = CONFIG["MAXSPEED"] * 1.5
+                    agent.max_speed = config["MAXSPEED"] * 1.5
                 else:
-                    agent.max_speed = random.uniform(15, CONFIG["MAXSPEED"])
+                    agent.max_speed = random.uniform(15, config["MAXSPEED"])
 
             near_entry = abs(agent.position.x - 202.5) <= 22.5
             left = 330 < agent.position.y < 345
             right = 255 < agent.position.y < 270
-            
+
             if (near_entry and (left or right)) or (agent.position.x >= 210 and (left or right)) or agent.position.x >= 375:
                 agent.target.x = 900
 
-        for agent in agents:
-            update_agent(agent, agents, TIMESTEP)
-
-        for agent in agents:
-            for wall in walls:
-                wall.collision_resolve(agent)
-
-        frame += 1
-        positions[frame] = {agent.id: (agent.position.x, agent.position.y) for agent in agents}
-
-    screen.fill((30, 30, 30))
-    for wall in walls:
-        pygame.draw.rect(screen, (200, 200, 200), wall.rect)
-    for agent in agents:
-        pygame.draw.circle(screen, (0, 255, 0), (int(agent.position.x), int(agent.position.y)), int(agent.radius))
-
-    pygame.display.flip()
-    clock.tick(60)
-
-pygame.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main(Walkway)
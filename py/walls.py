@@ -0,0 +1,203 @@
+import numpy as np
+
+class WallSet:
+    """Float AABBs of a scene's walls with a uniform-grid broadphase.
+
+    The grid is built once per geometry; call ``refit()`` after moving
+    walls. ``resolve()`` pushes every agent out of the walls in one batched
+    pass, visiting walls in list order so the result matches calling
+    ``Wall.collision_resolve`` in a nested loop.
+    """
+
+    def __init__(self, walls, cell_size=32, margin=3):
+        self.walls = walls
+        self.cell_size = cell_size
+        self.margin = margin
+        # agent-wall tests, for profiling; reset by the caller
+        self.tests = 0
+        self.refit()
+
+    def refit(self):
+        rects = [wall.rect for wall in self.walls]
+        self.left = np.array([r.left for r in rects], dtype=float)
+        self.top = np.array([r.top for r in rects], dtype=float)
+        self.right = np.array([r.right for r in rects], dtype=float)
+        self.bottom = np.array([r.bottom for r in rects], dtype=float)
+        self.build()
+
+    def build(self):
+        # pad by twice the largest radius: any wall touching an agent is listed in the cell of its center
+        pad = 2 * self.margin
+        size = self.cell_size
+        if not len(self.walls):
+            self.origin = np.zeros(2)
+            self.shape = (0, 0)
+            self.start = np.zeros(1, dtype=int)
+            self.ids = np.zeros(0, dtype=int)
+            self.keys = np.zeros(0, dtype=int)
+            return
+
+        self.origin = np.array([self.left.min() - pad, self.top.min() - pad])
+        x0 = ((self.left - pad - self.origin[0]) // size).astype(int)
+        x1 = ((self.right + pad - self.origin[0]) // size).astype(int)
+        y0 = ((self.top - pad - self.origin[1]) // size).astype(int)
+        y1 = ((self.bottom + pad - self.origin[1]) // size).astype(int)
+        self.shape = (x1.max() + 1, y1.max() + 1)
+
+        cells = []
+        ids = []
+        for i in range(len(self.walls)):
+            cx, cy = np.meshgrid(np.arange(x0[i], x1[i] + 1), np.arange(y0[i], y1[i] + 1), indexing="ij")
+            cells.append((cx * self.shape[1] + cy).ravel())
+            ids.append(np.full(cx.size, i))
+        cells = np.concatenate(cells)
+        ids = np.concatenate(ids)
+
+        order = np.lexsort((ids, cells))
+        self.ids = ids[order]
+        # (cell, wall) as one sorted key, to find the next wall after a given one in any cell
+        self.keys = cells[order] * len(self.walls) + self.ids
+        counts = np.bincount(cells, minlength=self.shape[0] * self.shape[1])
+        self.start = np.concatenate(([0], np.cumsum(counts)))
+
+    def following(self, pos, after):
+        """Index into ``ids`` of the first wall after wall ``after`` listed in each position's cell, or -1."""
+        cell = ((pos - self.origin) // self.cell_size).astype(int)
+        inside = (cell[:, 0] >= 0) & (cell[:, 0] < self.shape[0]) & (cell[:, 1] >= 0) & (cell[:, 1] < self.shape[1])
+        flat = np.where(inside, cell[:, 0] * self.shape[1] + cell[:, 1], 0)
+        found = np.searchsorted(self.keys, flat * len(self.walls) + after, side="right")
+        return np.where(inside & (found < self.start[flat + 1]), found, -1)
+
+    def resolve_arrays(self, pos, radius):
+        """Resolve penetrations in place on an (N, 2) position array."""
+        if not len(self.walls) or not len(pos):
+            return np.zeros(len(pos), dtype=bool)
+        if radius.max() > self.margin:
+            self.margin = radius.max()
+            self.build()
+
+        # each round every agent visits the next wall in list order from the cell it is in now, since
+        # pushes can chain it into cells its starting one does not cover
+        agent = np.arange(len(pos))
+        last = np.full(len(pos), -1)
+        moved = np.zeros(len(pos), dtype=bool)
+        while True:
+            found = self.following(pos[agent], last[agent])
+            agent, found = agent[found >= 0], found[found >= 0]
+            if not len(agent):
+                break
+            self.tests += len(agent)
+            wall = self.ids[found]
+            last[agent] = wall
+            p = pos[agent]
+            rad = radius[agent]
+            closest_x = np.maximum(self.left[wall], np.minimum(p[:, 0], self.right[wall]))
+            closest_y = np.maximum(self.top[wall], np.minimum(p[:, 1], self.bottom[wall]))
+            push = p - np.stack((closest_x, closest_y), axis=1)
+            dist = np.hypot(push[:, 0], push[:, 1])
+
+            hit = (dist < rad) & (dist > 0)
+            p[hit] += push[hit] / dist[hit, None] * (rad[hit] - dist[hit])[:, None]
+            still = dist == 0
+            p[still, 0] += rad[still]
+
+            pos[agent] = p
+            moved[agent[hit | still]] = True
+        return moved
+
+    def swept_candidates(self, prev, pos):
+        """(agent, wall) pairs whose cells overlap each agent's swept bounding box."""
+        size = self.cell_size
+        low = ((np.minimum(prev, pos) - self.origin) // size).astype(int)
+        high = ((np.maximum(prev, pos) - self.origin) // size).astype(int)
+        low = np.maximum(low, 0)
+        high = np.minimum(high, np.array(self.shape) - 1)
+        span = high - low
+
+        agents = [np.zeros(0, dtype=int)]
+        walls = [np.zeros(0, dtype=int)]
+        for dx in range(span[:, 0].max() + 1):
+            for dy in range(span[:, 1].max() + 1):
+                ok = (span[:, 0] >= dx) & (span[:, 1] >= dy)
+                agent = np.nonzero(ok)[0]
+                flat = (low[agent, 0] + dx) * self.shape[1] + low[agent, 1] + dy
+                first = self.start[flat]
+                count = self.start[flat + 1] - first
+                agents.append(np.repeat(agent, count))
+                walls.append(self.ids[np.repeat(first - np.cumsum(count) + count, count) + np.arange(count.sum())])
+        pairs = np.unique(np.concatenate(agents) * len(self.walls) + np.concatenate(walls))
+        return pairs // len(self.walls), pairs % len(self.walls)
+
+    def sweep_arrays(self, prev, pos, vel, radius):
+        """Continuous collision of circles moving prev -> pos against the walls.
+
+        Each wall is inflated by the agent radius and intersected with the
+        step's displacement. Agents that would cross a wall stop at first
+        contact, keep the tangential part of the remaining displacement,
+        and lose the velocity component into the wall. Agents that start
+        inside a wall are left to ``resolve_arrays``.
+        """
+        if not len(self.walls) or not len(pos):
+            return np.zeros(len(pos), dtype=bool)
+        if radius.max() > self.margin:
+            self.margin = radius.max()
+            self.build()
+
+        agent, wall = self.swept_candidates(prev, pos)
+        self.tests += len(agent)
+        start = prev[agent]
+        d = pos[agent] - start
+        rad = radius[agent]
+        lo = np.stack((self.left[wall] - rad, self.top[wall] - rad), axis=1)
+        hi = np.stack((self.right[wall] + rad, self.bottom[wall] + rad), axis=1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t0 = (lo - start) / d
+            t1 = (hi - start) / d
+        flat = d == 0
+        outside = (start < lo) | (start > hi)
+        t0 = np.where(flat, np.where(outside, np.inf, -np.inf), t0)
+        t1 = np.where(flat, np.inf, t1)
+        near = np.minimum(t0, t1)
+        far = np.maximum(t0, t1)
+        enter = near.max(axis=1)
+        leave = far.min(axis=1)
+        hit = (enter <= leave) & (enter >= 0) & (enter < 1)
+
+        first = np.full(len(pos), np.inf)
+        np.minimum.at(first, agent[hit], enter[hit])
+        chosen = hit & (enter == first[agent])
+        agent, wall, enter, d = agent[chosen], wall[chosen], enter[chosen], d[chosen]
+        agent, unique = np.unique(agent, return_index=True)
+        wall, enter, d = wall[unique], enter[unique], d[unique]
+        axis = near[chosen][unique].argmax(axis=1)
+
+        normal = np.zeros((len(agent), 2))
+        normal[np.arange(len(agent)), axis] = -np.sign(d[np.arange(len(agent)), axis])
+
+        rest = d * (1 - enter)[:, None]
+        rest -= normal * np.minimum((rest * normal).sum(axis=1), 0)[:, None]
+        pos[agent] = prev[agent] + d * enter[:, None] + rest
+        v = vel[agent]
+        v -= normal * np.minimum((v * normal).sum(axis=1), 0)[:, None]
+        vel[agent] = v
+
+        moved = np.zeros(len(pos), dtype=bool)
+        moved[agent] = True
+        return moved
+
+    def sweep(self, agents, prev):
+        pos = np.array([(agent.position.x, agent.position.y) for agent in agents], dtype=float).reshape(-1, 2)
+        vel = np.array([(agent.velocity.x, agent.velocity.y) for agent in agents], dtype=float).reshape(-1, 2)
+        radius = np.array([agent.radius for agent in agents], dtype=float)
+        moved = self.sweep_arrays(prev, pos, vel, radius)
+        for i in np.nonzero(moved)[0]:
+            agents[i].position.update(pos[i].tolist())
+            agents[i].velocity.update(vel[i].tolist())
+
+    def resolve(self, agents):
+        pos = np.array([(agent.position.x, agent.position.y) for agent in agents], dtype=float).reshape(-1, 2)
+        radius = np.array([agent.radius for agent in agents], dtype=float)
+        moved = self.resolve_arrays(pos, radius)
+        for i in np.nonzero(moved)[0]:
+            agents[i].position.update(pos[i].tolist())